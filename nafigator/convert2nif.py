@@ -484,14 +484,16 @@ class naf2nif(object):
         nif_collection.add_context(nif_context)
 
         # create nif:sentence and nif:word
-        words = {word['id']: word for word in doc.text}
-        terms = {term['id']: term for term in doc.terms}
+        # the layers of the NafDocument are cached, so nif elements are
+        # added to copies of the words, terms and sentences
+        words = {word['id']: dict(word) for word in doc.text}
+        terms = {term['id']: dict(term) for term in doc.terms}
         entities = {entity['id']: entity for entity in doc.entities}
 
         nif_sentences = []
         nif_words = []
         nif_terms = []
-        doc_sentences = doc.sentences
+        doc_sentences = [dict(sentence) for sentence in doc.sentences]
         for sent_idx, sentence in enumerate(doc_sentences):
             beginIndex = int(words[sentence['span'][0]['id']]['offset'])
             endIndex = (int(words[sentence['span'][-1]['id']]['offset'])+
@@ -6,6 +6,10 @@ This module contains the linguistic classes for nafigator
 
 """
 
+import logging
+import threading
+from collections import OrderedDict
+
 try:
     import spacy
 
@@ -20,6 +24,143 @@ try:
 except:
     STANZA_IMPORTED = False
 
+SPACY_MODELS = {"en": "en_core_web_sm", "nl": "nl_core_web_sm"}
+STANZA_PROCESSORS = "tokenize,pos,lemma,ner,depparse"
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded nlp models
+
+    The models are kept with key (engine, language, processors), where
+    processors is the spaCy model name or the Stanza processors. If more than
+    maxsize models are loaded, the least recently used model is evicted.
+    The registry can be used from multiple threads; a model is loaded only once.
+    """
+
+    def __init__(self, maxsize: int = 4) -> None:
+        """Initialize the registry
+
+        Args:
+            maxsize: the maximum number of models kept in memory
+        Returns:
+            None
+
+        """
+        self.maxsize = maxsize
+        self._models = OrderedDict()
+        self._loading = dict()
+        self._lock = threading.Lock()
+
+    def key(self, engine: str, lang: str, processors: str = None) -> tuple:
+        """Return the key of a model, with the default processors of the engine if None"""
+        engine = engine.lower()
+        if processors is None:
+            if engine == "spacy":
+                processors = SPACY_MODELS.get(lang, None)
+            elif engine == "stanza":
+                processors = STANZA_PROCESSORS
+        return (engine, lang, processors)
+
+    def load(self, engine: str, lang: str, processors: str):
+        """Load a model
+
+        Args:
+            engine: spacy or stanza
+            lang: language
+            processors: the spaCy model name or the Stanza processors
+        Returns:
+            the nlp model
+
+        """
+        if engine == "spacy":
+            if processors is None:
+                logging.error(f"no spaCy model known for language {lang}")
+                return None
+            return spacy.load(processors)
+        elif engine == "stanza":
+            return stanza.Pipeline(lang=lang, processors=processors, verbose=False)
+        else:
+            logging.error("unknown engine")
+            return None
+
+    def get(self, engine: str, lang: str, processors: str = None):
+        """Return a model, load it if it is not in the registry
+
+        Args:
+            engine: spacy or stanza
+            lang: language
+            processors: the spaCy model name or the Stanza processors, default of engine if None
+        Returns:
+            the nlp model
+
+        """
+        key = self.key(engine, lang, processors)
+        with self._lock:
+            if key in self._models.keys():
+                self._models.move_to_end(key)
+                return self._models[key]
+            loading = self._loading.setdefault(key, threading.Lock())
+        # other threads that need the same model wait until it is loaded
+        with loading:
+            with self._lock:
+                if key in self._models.keys():
+                    self._models.move_to_end(key)
+                    return self._models[key]
+            model = self.load(*key)
+            with self._lock:
+                if model is not None:
+                    self._models[key] = model
+                    while len(self._models) > self.maxsize:
+                        self._models.popitem(last=False)
+                self._loading.pop(key, None)
+        return model
+
+    def preload(self, engine: str, lang: str, processors: str = None):
+        """Load a model in the registry, see get"""
+        return self.get(engine, lang, processors)
+
+    def evict(self, engine: str = None, lang: str = None, processors: str = None) -> None:
+        """Remove models from the registry
+
+        Args:
+            engine: if not None only models of this engine are removed
+            lang: if not None only models of this language are removed
+            processors: if not None only models with these processors are removed
+        Returns:
+            None
+
+        """
+        with self._lock:
+            for key in list(self._models.keys()):
+                if (
+                    (engine is None or key[0] == engine.lower())
+                    and (lang is None or key[1] == lang)
+                    and (processors is None or key[2] == processors)
+                ):
+                    del self._models[key]
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return self.key(*key) in self._models.keys()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+
+model_registry = ModelRegistry()
+
+
+def preload(engine: str, lang: str, processors: str = None):
+    """Load a model in the process-wide model registry"""
+    return model_registry.preload(engine, lang, processors)
+
+
+def evict(engine: str = None, lang: str = None, processors: str = None) -> None:
+    """Remove models from the process-wide model registry"""
+    model_registry.evict(engine, lang, processors)
+
+
 if SPACY_IMPORTED:
 
     class spacyProcessor:
@@ -35,10 +176,7 @@ if SPACY_IMPORTED:
             """
             self.lang = lang
             if nlp is None:
-                if lang == "en":
-                    self.nlp = spacy.load("en_core_web_sm")
-                elif lang == "nl":
-                    self.nlp = spacy.load("nl_core_web_sm")
+                self.nlp = model_registry.get("spacy", lang)
             else:
                 if isinstance(nlp, dict):
                     if lang in nlp.keys():
@@ -85,6 +223,19 @@ if SPACY_IMPORTED:
             self.doc = self.nlp(text)
             return self.doc
 
+        def pipe(self, texts, batch_size: int = 16, n_process: int = 1):
+            """Process texts in batches
+
+            Args:
+                texts: iterable of texts
+                batch_size: number of texts in a batch
+                n_process: number of processes
+            Returns:
+                generator: processed documents in order of the texts
+
+            """
+            return self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+
         def document_sentences(self, doc):
             return doc.sents
 
@@ -169,11 +320,7 @@ if STANZA_IMPORTED:
         ):
 
             if nlp is None:
-                self.nlp = stanza.Pipeline(
-                    lang=lang,
-                    processors="tokenize,pos,lemma,ner,depparse",
-                    verbose=False,
-                )
+                self.nlp = model_registry.get("stanza", lang)
             else:
                 self.nlp = nlp
             self.lang = lang
@@ -201,6 +348,26 @@ if STANZA_IMPORTED:
             self.doc = self.nlp(text)
             return self.doc
 
+        def pipe(self, texts, batch_size: int = 16, n_process: int = 1):
+            """Process texts in batches with bulk processing of the pipeline
+
+            Args:
+                texts: iterable of texts
+                batch_size: number of texts in a batch
+                n_process: not used, stanza processes batches in one process
+            Returns:
+                generator: processed documents in order of the texts
+
+            """
+            batch = []
+            for text in texts:
+                batch.append(stanza.Document([], text=text))
+                if len(batch) == batch_size:
+                    yield from self.nlp.bulk_process(batch)
+                    batch = []
+            if len(batch) > 0:
+                yield from self.nlp.bulk_process(batch)
+
         def document_sentences(self, doc):
             return doc.sentences
 
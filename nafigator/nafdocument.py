@@ -19,14 +19,23 @@ from .utils import prepare_comment_text
 import datetime
 import logging
 import camelot
+import numpy as np
 from copy import deepcopy
 import io
+import os
+import shutil
+import tempfile
+import json
+from bisect import bisect_right
 
 NAF_VERSION_TO_DTD = {
     "v3": "data/naf_v3.dtd",
     "v3.1": "data/naf_v3_1.dtd",
 }
 
+# compiled dtds by naf version, loaded once per process
+NAF_DTD_CACHE = dict()
+
 FILEDESC_ELEMENT_TAG = "fileDesc"
 PUBLIC_ELEMENT_TAG = "public"
 
@@ -66,6 +75,16 @@ LINGUISTIC_OCCURRENCE_TAG = "lp"
 
 PREFIX_NAF_BASE = "naf-base"
 
+# the cached properties of a NafDocument that are derived from each layer
+LAYER_CACHE_DEPENDENCIES = {
+    TEXT_LAYER_TAG: ["text", "sentences", "paragraphs", "wf_by_id", "columns"],
+    TERMS_LAYER_TAG: ["terms", "sentences", "paragraphs", "term_by_id", "terms_by_wf", "columns"],
+    ENTITIES_LAYER_TAG: ["entities", "columns"],
+    DEPS_LAYER_TAG: ["deps", "columns"],
+    MULTIWORDS_LAYER_TAG: ["multiwords", "mw_max_id"],
+    FORMATS_LAYER_TAG: ["formats_offsets"],
+}
+
 namespaces = {
     "dc": "http://purl.org/dc/elements/1.1/",
     # "naf-base": "https://dnb.nl/naf-Base/elements/1.0/",
@@ -79,11 +98,483 @@ def QName(prefix: str = None, name: str = None):
     return name
 
 
+def multiword_number(mw_id: str) -> int:
+    """Returns the number of a multiword id (mw followed by a number), 0 for other ids"""
+    number = mw_id[2:] if mw_id is not None else ""
+    return int(number) if number.isdigit() else 0
+
+
+def naf_dtd(naf_version: str) -> etree.DTD:
+    """Returns the compiled dtd of a naf version
+
+    The dtd is loaded once per process and shared by all NafDocuments. Worker
+    processes that are forked after the first validation inherit the cache.
+    """
+    dtd = NAF_DTD_CACHE.get(naf_version, None)
+    if dtd is None:
+        dtd = load_dtd(NAF_VERSION_TO_DTD[naf_version])
+        NAF_DTD_CACHE[naf_version] = dtd
+    return dtd
+
+
+def is_layer_validation_artifact(error) -> bool:
+    """Returns True for dtd errors caused by validating a layer on its own
+
+    A layer validated on its own carries the namespace declarations of the
+    document and cannot resolve references to ids in other layers.
+    """
+    if error.type_name == "DTD_UNKNOWN_ID":
+        return True
+    return error.type_name == "DTD_UNKNOWN_ATTRIBUTE" and "attribute xmlns:" in error.message
+
+
+class PdfFormatsBuilder:
+    """Builds the formats layer from pdfminer xml output, one page at a time
+
+    The offsets, the current table number and whether the previous character
+    was outside a table are carried over from one page to the next.
+    """
+
+    def __init__(self, layer: etree._Element, coordinates: bool, pdf_tables=None):
+        """
+        Args:
+        layer: the formats layer element to which the pages are added
+        coordinates: if True bbox information is added to the formats layer.
+        pdf_tables: raw output of camelot
+        """
+        self.layer = layer
+        self.coordinates = coordinates
+        self.pdf_tables = pdf_tables
+        self.offset = 0
+        self.table_nr = 0
+        self.previous_outside = False
+        self.page_number = 0
+
+        # bboxes of the tables per page, used to check whether characters are part of a table
+        self.table_bboxes = dict()
+        if pdf_tables is not None:
+            for pdf_table in pdf_tables:
+                self.table_bboxes.setdefault(
+                    pdf_table.__dict__["page"], []).append(pdf_table.__dict__["_bbox"])
+        self.table_bboxes = {
+            page: np.array(bboxes, dtype=float) for page, bboxes in self.table_bboxes.items()
+        }
+
+    def add_element(self, element, tag):
+        # create a filtered formats element
+        subelement = etree.SubElement(element, tag)
+        for item in element.attrib.keys():
+            if self.coordinates:
+                if item not in ["colourspace", "ncolour"]:
+                    subelement.attrib[item] = element.attrib[item]
+            else:
+                if item not in ["bbox", "colourspace", "ncolour"]:
+                    subelement.attrib[item] = element.attrib[item]
+        return subelement
+
+    def add_text_element(self, element, tag, text, attrib, offset):
+        # add text and attributes to element
+        if (text is not None) and (text.strip() != ""):
+            text_element = etree.SubElement(element, tag)
+            for item in attrib.keys():
+                text_element.attrib[item] = attrib[item]
+            text_element.text = text
+            text_element.set("length", str(len(text)))
+            text_element.set("offset", str(offset))
+
+    def copy_dict(self, element):
+        # filters element and convert into dictionary
+        if self.coordinates:
+            return {
+                item: element.attrib[item]
+                for item in element.keys()
+                if item not in ["colourspace", "ncolour"]
+            }
+        else:
+            return {
+                item: element.attrib[item]
+                for item in element.keys()
+                if item not in ["bbox", "colourspace", "ncolour"]
+            }
+
+    def check_outside_tables(self, char_coors: list, page_nr: int = 1):
+        """
+        returns for each character whether it lies outside all tables on the page.
+        Args:
+        char_coors: list of bbox coordinates of the characters (None if unknown)
+        page_nr: number of the page of the characters
+
+        A character lies outside a table if any of its coordinates lies outside
+        the bbox of that table. Characters without coordinates and characters
+        on pages without tables are outside.
+        """
+        bboxes = self.table_bboxes.get(page_nr, None)
+        if bboxes is None or len(char_coors) == 0:
+            return np.ones(len(char_coors), dtype=bool)
+        unknown = np.array([c is None for c in char_coors])
+        coors = np.array(
+            [c if c is not None else [0.0, 0.0, 0.0, 0.0] for c in char_coors], dtype=float)
+        x_left, y_bottom, x_right, y_top = (coors[:, i:i + 1] for i in range(4))
+        cm_x_left, cm_y_bottom, cm_x_right, cm_y_top = bboxes.T
+        outside = ((x_left < cm_x_left)
+                   | (x_left > cm_x_right)
+                   | (x_right > cm_x_right)
+                   | (x_right < cm_x_left)
+                   | (y_bottom < cm_y_bottom)
+                   | (y_bottom > cm_y_top)
+                   | (y_top > cm_y_top)
+                   | (y_top < cm_y_bottom))
+        return outside.all(axis=1) | unknown
+
+    def add_page(self, page: etree._Element):
+        """
+        adds a single page element of the pdfminer xml output to the formats layer.
+        Args:
+        page: page element of pdfminer xml output
+        """
+        coordinates = self.coordinates
+        pdf_tables = self.pdf_tables
+        add_element = self.add_element
+        add_text_element = self.add_text_element
+        copy_dict = self.copy_dict
+        check_outside_tables = self.check_outside_tables
+
+        offset = self.offset
+        table_nr = self.table_nr
+        previous_outside = self.previous_outside
+        page_number = self.page_number
+
+        page_element = add_element(self.layer, "page")
+        first_char_on_page = True
+        previous_char_coor = None
+        page_length = 0
+        if coordinates:
+            page_bbox = page.attrib["bbox"]
+        for page_item in page:
+            if page_item.tag == "textbox":
+                page_item_element = add_element(
+                    page_element, page_item.tag)
+                for textline in page_item:
+                    textline_element = add_element(
+                        page_item_element, textline.tag
+                    )
+                    # check if textline contains characters
+                    if len(textline) > 0:
+                        previous_text = textline[0].text
+                        previous_attrib = copy_dict(textline[0])
+                        if previous_text is None:
+                            previous_text = ""
+                        # get bbox of characters to check if they are part of a table
+                        if pdf_tables is not None:
+                            char_coors = list()
+                            for char in textline[1:]:
+                                bbox = char.attrib.get("bbox", None)
+                                if bbox is not None:
+                                    previous_char_coor = [float(i)
+                                                          for i in bbox.split(',')]
+                                char_coors.append(previous_char_coor)
+                            outsides = check_outside_tables(
+                                char_coors, page_number + 1)
+                        else:
+                            outsides = [True] * (len(textline) - 1)
+                        for idx, char in enumerate(textline[1:]):
+                            outside = outsides[idx]
+                            if outside:
+                                # add character to text
+                                char_attrib = copy_dict(char)
+                                if previous_attrib == char_attrib:
+                                    if char.text is not None:
+                                        previous_text += char.text
+                                    if idx == len(textline) - 1:
+                                        add_text_element(
+                                            textline_element,
+                                            char.tag,
+                                            previous_text,
+                                            previous_attrib,
+                                            offset,
+                                        )
+                                        page_length += len(previous_text)
+                                        offset += len(previous_text)
+
+                                else:  # when format changes
+
+                                    add_text_element(
+                                        textline_element,
+                                        char.tag,
+                                        previous_text,
+                                        previous_attrib,
+                                        offset,
+                                    )
+                                    if previous_text is not None:
+                                        page_length += len(previous_text)
+                                        offset += len(previous_text)
+                                    previous_text = char.text
+                                    previous_attrib = char_attrib
+                                    # adds a textline element when last character is reached
+                                    if idx == len(textline) - 1:
+                                        add_text_element(
+                                            textline_element,
+                                            char.tag,
+                                            previous_text,
+                                            previous_attrib,
+                                            offset,
+                                        )
+                                        if previous_text is not None:
+                                            page_length += len(previous_text)
+                                            offset += len(previous_text)
+
+                                previous_outside = True
+
+                            else:
+                                # replace text with text of table
+                                if table_nr < len(pdf_tables):
+
+                                    if previous_outside or (first_char_on_page and not previous_outside):
+
+                                        textline_element.getparent().remove(textline_element)
+
+                                        table_df_text = pdf_tables[table_nr].__dict__[
+                                            'df']
+                                        table_rows = table_df_text.apply(
+                                            lambda x: x.str.cat(sep=' | '), axis=1)
+                                        for table_textline in table_rows:
+                                            textline_element = add_element(
+                                                page_item_element, textline.tag
+                                            )
+                                            table_textline_text = table_textline.replace(
+                                                "\n", "")
+                                            add_text_element(
+                                                textline_element,
+                                                'text',
+                                                table_textline_text,
+                                                attrib={},
+                                                offset=offset
+                                            )
+                                            offset += len(table_textline_text)
+                                            page_length += len(
+                                                table_textline_text)
+
+                                            offset += 1
+                                            page_length += 1
+
+                                        table_nr += 1
+
+                                previous_outside = False
+
+                                page_length += len(previous_text)
+                                offset += len(previous_text)
+
+                    # if nothing has been added to the textline_element we remove is
+                    if len(textline_element) == 0:
+                        textline_element.getparent().remove(textline_element)
+                    else:
+                        page_length += 1
+                        offset += 1
+
+                # if nothing has been added to the page_item_element we remove is
+                if len(page_item_element) == 0:
+                    page_item_element.getparent().remove(page_item_element)
+                else:
+                    page_length += 1
+                    offset += 1
+
+            elif page_item.tag == "layout":
+
+                page_length += 1
+                offset += 1
+
+            elif page_item.tag == "figure":
+
+                page_item_element = add_element(
+                    page_element, page_item.tag)
+                if len(page_item) > 0:
+                    previous_text = None
+                    previous_attrib = None
+                    if 0 < len(page_item):
+                        for idx, char in enumerate(page_item):
+                            if char.tag in ["text", "line"]:
+                                char_attrib = copy_dict(char)
+                                if previous_attrib == char_attrib:
+                                    if previous_text is not None:
+                                        previous_text += char.text
+                                    else:
+                                        previous_text = char.text
+                                    if idx == len(page_item) - 1:
+                                        add_text_element(
+                                            page_item_element,
+                                            char.tag,
+                                            previous_text,
+                                            previous_attrib,
+                                            offset,
+                                        )
+                                        if previous_text is not None:
+                                            page_length += len(previous_text)
+                                            offset += len(previous_text)
+                                else:  # -> previous_attrib != char_attrib
+                                    add_text_element(
+                                        page_item_element,
+                                        char.tag,
+                                        previous_text,
+                                        previous_attrib,
+                                        offset,
+                                    )
+                                    if previous_text is not None:
+                                        page_length += len(previous_text)
+                                        offset += len(previous_text)
+
+                                    if idx == len(page_item) - 1:
+                                        add_text_element(
+                                            page_item_element,
+                                            char.tag,
+                                            char.text,
+                                            char_attrib,
+                                            offset,
+                                        )
+                                        if char.text is not None:
+                                            page_length += len(char.text)
+                                            offset += len(char.text)
+                                    else:
+                                        previous_text = char.text
+                                        previous_attrib = char_attrib
+
+        # tables are stored separately in the formats layer
+        if pdf_tables is not None:
+            table = etree.SubElement(page_element, "tables")
+            for pdf_table in pdf_tables:
+                if pdf_table.__dict__['page'] == page_number + 1:
+                    table_on_page = etree.SubElement(
+                        table, "table", attrib={
+                            "page": str(page_number+1),
+                            "order": str(pdf_table.__dict__["order"]),
+                            "shape": str(pdf_table.__dict__["shape"]),
+                            "_bbox": str(pdf_table.__dict__["_bbox"]),
+                            "cols": str(pdf_table.__dict__["cols"])
+                        }
+                    )
+                    table_df = pdf_table.__dict__['df']
+                    for idx in table_df.index:
+                        table_row = etree.SubElement(
+                            table_on_page, "row", attrib={})
+                        table_index = etree.SubElement(
+                            table_row, "index", attrib={})
+                        table_index.text = str(idx).replace("\n", "")
+                        for col in table_df.columns:
+                            table_cell = etree.SubElement(
+                                table_row, "cell", attrib={})
+                            table_cell.text = str(
+                                table_df.loc[idx, col]).replace("\n", "")
+
+        page_element.set("length", str(page_length))
+        page_element.set("offset", str(offset - page_length))
+        if coordinates:
+            page_element.set("bbox", page_bbox)
+
+        self.offset = offset
+        self.table_nr = table_nr
+        self.previous_outside = previous_outside
+        self.page_number = page_number + 1
+
+
+class NafWriter:
+    """Writes a NAF document incrementally
+
+    Layers are written one at a time, so that a layer can be removed from the
+    NafDocument as soon as it is complete (see NafDocument.write_layers). The
+    nafHeader is always the first layer: the root element is started when
+    the nafHeader is written, and layers that are written before it are kept
+    in a temporary file (in serialized form) and copied after it. The
+    namespaces are declared once, on the root element.
+
+    Usage:
+        with NafWriter("output.naf.xml") as writer:
+            doc.write_layers(writer)
+    """
+
+    def __init__(self, output) -> None:
+        """
+        Args:
+        output: the location of the NafDocument to be stored or a binary file object
+        """
+        self.output = output
+        self._file = None
+        self._spool = None
+        self._root_started = False
+        # the namespace declarations of the root, removed from the layers
+        self._declarations = [
+            ' xmlns:{}="{}"'.format(prefix, uri).encode("utf-8") for prefix, uri in namespaces.items()
+        ]
+
+    def __enter__(self):
+        self._file = open(self.output, "wb") if isinstance(self.output, str) else self.output
+        self._file.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if not self._root_started:
+                self.start_root()
+                self._copy_spool()
+            self._file.write(b"\n</NAF>")
+        finally:
+            if self._spool is not None:
+                self._spool.close()
+            if isinstance(self.output, str):
+                self._file.close()
+
+    def start_root(self, attrib: dict = None) -> None:
+        """
+        starts the NAF root element.
+        Args:
+        attrib: the attributes of the root element (version and language)
+        """
+        root = etree.tostring(etree.Element("NAF", attrib or {}, nsmap=namespaces))
+        # the root is serialized as an empty element
+        self._file.write(root[:-2] + b">")
+        self._root_started = True
+
+    def _copy_spool(self) -> None:
+        """Copy the layers that are written before the nafHeader to the output"""
+        if self._spool is not None:
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, self._file)
+            self._spool.close()
+            self._spool = None
+
+    def write_layer(self, layer: etree._Element, root_attrib: dict = None) -> None:
+        """
+        writes a complete layer.
+        Args:
+        layer: the layer element
+        root_attrib: the attributes of the root element, used if the layer is the nafHeader
+        """
+        etree.indent(layer, space="  ", level=1)
+        data = etree.tostring(layer, encoding="utf-8", with_tail=False)
+        # the namespaces of the root are declared on the start tag of a layer
+        # that is removed from the root; the end of the start tag is the first >
+        # because > is escaped in attribute values
+        end = data.index(b">")
+        start = data[:end]
+        for declaration in self._declarations:
+            start = start.replace(declaration, b"")
+        data = b"\n  " + start + data[end:]
+        if layer.tag == NAF_HEADER and not self._root_started:
+            self.start_root(root_attrib)
+            self._file.write(data)
+            self._copy_spool()
+        elif self._root_started:
+            self._file.write(data)
+        else:
+            if self._spool is None:
+                self._spool = tempfile.TemporaryFile()
+            self._spool.write(data)
+
+
 class NafDocument(etree._ElementTree):
     """The NafDocument class (subclass of an etree.elementtree)"""
 
     def generate(self, params: dict):
         """Initialize a NafDocument with data from the params dict"""
+        self.invalidate()
         self._setroot(etree.Element("NAF", nsmap=namespaces))
         self.set_version(params["naf_version"])
         if params["language"] is not None:
@@ -92,26 +583,84 @@ class NafDocument(etree._ElementTree):
         self.add_filedesc_element(params["fileDesc"])
         self.add_public_element(params["public"])
 
-    def open(self, input: Union[str, bytes]):
+    def open(self, input: Union[str, bytes], layers: list = None, skip: list = None):
         """Function to open a NafDocument
 
+        If layers or skip is given the document is read with iterparse and
+        only the selected layers are kept, for example skip=["formats",
+        "formats_copy"]. Parsing stops as soon as all layers in layers are
+        read.
+
         Args:
             input: the location of the NafDocument to be opened or a bytes object containing the file content
+            layers: the tags of the layers to be loaded, all layers if None
+            skip: the tags of the layers not to be loaded
 
         Returns:
             NafDocument: the NAF document that is opened
 
         """
+        self.invalidate()
         if isinstance(input, str):
-            with open(input, "r", encoding="utf-8") as f:
-                self._setroot(etree.parse(f).getroot())
+            if layers is None and skip is None:
+                with open(input, "r", encoding="utf-8") as f:
+                    self._setroot(etree.parse(f).getroot())
+            else:
+                self._setroot(self._iterparse(input, layers, skip))
         elif type(input) == bytes:
             stream_data = io.BytesIO(input)
-            self._setroot(etree.parse(stream_data).getroot())
+            if layers is None and skip is None:
+                self._setroot(etree.parse(stream_data).getroot())
+            else:
+                self._setroot(self._iterparse(stream_data, layers, skip))
         else:
             raise TypeError("invalid input, instead of bytes or string it is" + str(type(input)))
         return self
 
+    def _iterparse(self, source, layers: list = None, skip: list = None) -> etree._Element:
+        """Function to read the selected layers of a NafDocument with iterparse
+
+        Args:
+            source: the file name or binary file object to be parsed
+            layers: the tags of the layers to be loaded, all layers if None
+            skip: the tags of the layers not to be loaded
+
+        Returns:
+            etree._Element: the root with the selected layers
+
+        """
+        root = None
+        depth = 0
+        keep = True
+        remaining = set(layers) if layers is not None else None
+        for event, element in etree.iterparse(source, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 1:
+                    root = element
+                elif depth == 2:
+                    keep = (layers is None or element.tag in layers) and (
+                        skip is None or element.tag not in skip
+                    )
+            else:
+                depth -= 1
+                if depth == 1:
+                    if not keep:
+                        root.remove(element)
+                    elif remaining is not None:
+                        remaining.discard(element.tag)
+                        if len(remaining) == 0:
+                            break
+                elif depth > 1 and not keep:
+                    # free the content of a skipped layer while it is parsed
+                    element.clear()
+        # iterparse reads ahead, so after an early stop the root can contain
+        # (partially parsed) layers that were not selected
+        for element in list(root):
+            if layers is not None and element.tag not in layers:
+                root.remove(element)
+        return root
+
     def write(self, output: str) -> None:
         """Function to write a NafDocument
 
@@ -124,6 +673,101 @@ class NafDocument(etree._ElementTree):
         """
         super().write(output, encoding="utf-8", pretty_print=True, xml_declaration=True)
 
+    def write_layers(self, writer: NafWriter, layers: list = None) -> None:
+        """Function to write layers of a NafDocument incrementally
+
+        The layers are written in document order and removed from the
+        NafDocument. The offsets of the formats layer (formats_offsets) are
+        kept, so that page_number and paragraph_number can be used after the
+        formats layer is written.
+
+        Args:
+            writer: the NafWriter to which the layers are written
+            layers: the tags of the layers to be written, all layers if None
+
+        Returns:
+            None
+
+        """
+        root = self.getroot()
+        for layer in list(root):
+            if isinstance(layer.tag, str) and (layers is None or layer.tag in layers):
+                root.remove(layer)
+                if layer.tag != FORMATS_LAYER_TAG:
+                    self.invalidate(layer.tag)
+                writer.write_layer(layer, root.attrib)
+
+    def write_columns(self, output: str) -> None:
+        """Function to write the columns of a NafDocument to a binary sidecar directory
+
+        Each column of to_columns is stored as a separate .npy file, named
+        table.name.npy, that can be memory-mapped by read_columns without any
+        XML parsing. A column of strings is stored as the utf-8 bytes of the
+        strings (table.name.data.npy) and the byte offsets of the strings
+        (table.name.offsets.npy, one more than the number of strings). The
+        version, language, header and raw text are stored in meta.json.
+
+        Args:
+            output: the location of the directory to be stored
+
+        Returns:
+            None
+
+        """
+        os.makedirs(output, exist_ok=True)
+        tables = dict()
+        for table, table_columns in self.to_columns().items():
+            tables[table] = dict()
+            for name, array in table_columns.items():
+                location = os.path.join(output, table + "." + name)
+                if array.dtype == object:
+                    tables[table][name] = "string"
+                    values = [(value if value is not None else "").encode("utf-8") for value in array]
+                    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+                    np.cumsum([len(value) for value in values], out=offsets[1:])
+                    np.save(location + ".data.npy", np.frombuffer(b"".join(values), dtype=np.uint8))
+                    np.save(location + ".offsets.npy", offsets)
+                else:
+                    tables[table][name] = "array"
+                    np.save(location + ".npy", array)
+        meta = {
+            "version": self.version,
+            "language": self.language,
+            "header": self.header if self.find(NAF_HEADER) is not None else None,
+            "raw": self.raw if self.find(RAW_LAYER_TAG) is not None else None,
+            "tables": tables,
+        }
+        with open(os.path.join(output, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, default=dict)
+
+    def open_columns(self, input: str):
+        """Function to open a NafDocument from a sidecar directory written with write_columns
+
+        No XML is parsed: the columns are memory-mapped and returned by
+        to_columns. The document only contains the version, language and raw
+        layer; the header is returned by read_columns.
+
+        Args:
+            input: the location of the sidecar directory
+
+        Returns:
+            NafDocument: the NAF document that is opened
+
+        """
+        columns = read_columns(input)
+        self.invalidate()
+        self._setroot(etree.Element("NAF", nsmap=namespaces))
+        self.set_version(columns.pop("version"))
+        if columns["language"] is not None:
+            self.set_language(columns["language"])
+        columns.pop("language")
+        columns.pop("header")
+        raw = columns.pop("raw")
+        if raw is not None:
+            self.add_raw_text_element(RawElement(text=raw))
+        self._cached("columns", lambda: columns)
+        return self
+
     def getstream(self) -> bytes:
         """
         Function to stream the NafDocument
@@ -172,22 +816,48 @@ class NafDocument(etree._ElementTree):
     @property
     def deps(self):
         """Returns dependencies layer of the NAF document as list"""
-        return [
+        return self._cached("deps", lambda: [
             dep.attrib
             for dep in self.findall(DEPS_LAYER_TAG + "/" + DEP_OCCURRENCE_TAG)
-        ]
+        ])
 
     @property
     def text(self):
         """Returns text layer of the NAF document as list of dicts"""
-        return [
+        return self._cached("text", lambda: [
             dict({"text": wf.text}, **dict(wf.attrib))
             for wf in self.findall(TEXT_LAYER_TAG + "/" + TEXT_OCCURRENCE_TAG)
-        ]
+        ])
 
     @property
     def terms(self):
         """Returns terms layer of the NAF document as list of dicts"""
+        return self._cached("terms", self._terms)
+
+    @property
+    def wf_by_id(self):
+        """Returns the word forms of the text layer as dict by id"""
+        return self._cached("wf_by_id", lambda: {wf["id"]: wf for wf in self.text})
+
+    @property
+    def term_by_id(self):
+        """Returns the terms of the terms layer as dict by id"""
+        return self._cached("term_by_id", lambda: {term["id"]: term for term in self.terms})
+
+    @property
+    def terms_by_wf(self):
+        """Returns the terms of the terms layer as dict with lists of terms by word form id"""
+
+        def terms_by_wf():
+            index = dict()
+            for term in self.terms:
+                for target in term.get("span", []):
+                    index.setdefault(target["id"], []).append(term)
+            return index
+
+        return self._cached("terms_by_wf", terms_by_wf)
+
+    def _terms(self):
         terms = list()
         for child in self.findall(TERMS_LAYER_TAG + "/" + TERM_OCCURRENCE_TAG):
             term_data = dict(child.attrib)
@@ -211,6 +881,9 @@ class NafDocument(etree._ElementTree):
     @property
     def multiwords(self):
         """Returns multiword layer of the NAF document as list of dicts"""
+        return self._cached("multiwords", self._multiwords)
+
+    def _multiwords(self):
         mw = list()
         for child in self.findall(
             MULTIWORDS_LAYER_TAG + "/" + MULTIWORD_OCCURRENCE_TAG
@@ -242,6 +915,9 @@ class NafDocument(etree._ElementTree):
     @property
     def entities(self):
         """Returns entities layer of the NAF document as list of dicts"""
+        return self._cached("entities", self._entities)
+
+    def _entities(self):
         entities = list()
         for child in self.findall(ENTITIES_LAYER_TAG + "/" + ENTITY_OCCURRENCE_TAG):
             entity_data = dict(child.attrib)
@@ -275,129 +951,352 @@ class NafDocument(etree._ElementTree):
     @property
     def sentences(self):
         """Returns sentences of the NAF document as list of dicts"""
-        word2term = {
-            item["id"]: term["id"] for term in self.terms for item in term["span"]
-        }
-        last_sentence = list()
-        sentences = list()
-        sentence_list = list()
-        sent_num = 1
-        pages = set()
-        para = set()
-        span = list()
-        terms = list()
-        for item in self.text:
-            if item["sent"] == str(sent_num):
-                sentence_list.append(item["text"])
-                span.append({"id": item["id"]})
-                if item["id"] in word2term.keys():
-                    terms.append({"id": word2term.get(item["id"])})
-                pages.add(item.get("page", "0"))
-                para.add(item.get("para", "0"))
-                last_sentence = [item["sent"]]
-            else:
-                sentences.append(
-                    {
-                        "text": " ".join(sentence_list),
-                        "para": list(para),
-                        "page": list(pages),
-                        "span": span,
-                        "terms": terms,
-                        "sent": last_sentence
-                    }
-                )
-                sentence_list = list([item["text"]])
-                pages = set()
-                para = set()
-                span = list()
-                terms = list()
-                span.append({"id": item["id"]})
-                if item["id"] in word2term.keys():
-                    terms.append({"id": word2term.get(item["id"])})
-                pages.add(item.get("page", "0"))
-                para.add(item.get("para", "0"))
-                last_sentence = [item["sent"]]
-                sent_num += 1
-        if sent_num >= 1:
-            if sentence_list != []:
-                sentences.append(
-                    {
-                        "text": " ".join(sentence_list),
-                        "para": list(para),
-                        "page": list(pages),
-                        "span": span,
-                        "terms": terms,
-                        "sent": last_sentence
-                    }
-                )
-        return sentences
+        return self._cached("sentences", self._sentences)
+
+    def _sentences(self):
+        return self._text_groups("sent")
 
     @property
     def paragraphs(self):
         """Returns paragraphs of the NAF document as list of dicts"""
+        return self._cached("paragraphs", self._paragraphs)
+
+    def _paragraphs(self):
+        text = self.text
 
         # return empty list if no para attributes are included
-        if any(["para" not in item.keys() for item in self.text]):
+        if any("para" not in item for item in text):
             return []
 
-        word2term = {
-            item["id"]: term["id"] for term in self.terms for item in term["span"]
-        }
-        paragraphs = list()
-        paragraph_list = list()
-        sentence_list = list()
-        para_num = 1
-        pages = set()
-        para = set()
-        span = list()
-        terms = list()
+        return self._text_groups("para")
+
+    def _text_groups(self, key: str):
+        """Returns the word forms grouped by consecutive values of key (sent or para) as list of dicts"""
+        terms_by_wf = self.terms_by_wf
+        groups = list()
+        value = None
         for item in self.text:
-            if item["para"] == str(para_num):
-                paragraph_list.append(item["text"])
-                span.append({"id": item["id"]})
-                if item["id"] in word2term.keys():
-                    terms.append({"id": word2term.get(item["id"])})
-                pages.add(item.get("page", "0"))
-                para.add(item.get("para", "0"))
-                if item.get("sent", "0") not in sentence_list:
-                    sentence_list.append(item.get("sent", "0"))
-            else:
-                paragraphs.append(
-                    {
-                        "text": " ".join(paragraph_list),
-                        "para": list(para),
-                        "page": list(pages),
-                        "span": span,
-                        "terms": terms,
-                        "sent": sentence_list
-                    }
-                )
-                paragraph_list = list([item["text"]])
-                sentence_list = list()
-                pages = set()
-                para = set()
-                span = list()
-                terms = list()
-                span.append({"id": item["id"]})
-                if item["id"] in word2term.keys():
-                    terms.append({"id": word2term.get(item["id"])})
-                pages.add(item.get("page", "0"))
-                para.add(item.get("para", "0"))
-                if item.get("sent", "0") not in sentence_list:
-                    sentence_list.append(item.get("sent", "0"))
-                para_num += 1
-        if para_num > 1:
-            paragraphs.append(
+            if len(groups) == 0 or item[key] != value:
+                value = item[key]
+                # the sentence numbers are stored as dict keys, an ordered set
+                group = {"text": list(), "para": set(), "page": set(), "span": list(), "terms": list(), "sent": dict()}
+                groups.append(group)
+            group["text"].append(item["text"])
+            group["span"].append({"id": item["id"]})
+            terms = terms_by_wf.get(item["id"], None)
+            if terms is not None:
+                group["terms"].append({"id": terms[-1]["id"]})
+            group["page"].add(item.get("page", "0"))
+            group["para"].add(item.get("para", "0"))
+            group["sent"][item.get("sent", "0")] = None
+        return [
+            {
+                "text": " ".join(group["text"]),
+                "para": list(group["para"]),
+                "page": list(group["page"]),
+                "span": group["span"],
+                "terms": group["terms"],
+                "sent": list(group["sent"]),
+            }
+            for group in groups
+        ]
+
+    @property
+    def formats_offsets(self):
+        """Returns the texts and offsets of the formats layer as dict of lists
+
+        The result is None if the NAF document has no formats layer, otherwise
+        a dict with
+            texts: the texts of the text elements in document order
+            offsets: the offsets of the text elements in document order
+            pages: the offsets at which the pages start
+            paragraphs: the offsets at which paragraphs start (after a text
+                element in a textbox that ends with . or ?)
+        The offsets are sorted, so an offset is mapped to a text element, page
+        or paragraph with bisect (see page_number and paragraph_number).
+
+        """
+        return self._cached("formats_offsets", self._formats_offsets)
+
+    def _formats_offsets(self):
+        formats = self.find(FORMATS_LAYER_TAG)
+        if formats is None:
+            return None
+        texts = list()
+        offsets = list()
+        pages = list()
+        paragraphs = [0]
+        for page in formats:
+            pages.append(int(page.get("offset")))
+            for textbox in page:
+                if textbox.tag == "textbox":
+                    for textline in textbox:
+                        for text_element in textline:
+                            text = text_element.text
+                            offset = int(text_element.get("offset"))
+                            texts.append(text)
+                            offsets.append(offset)
+                            stripped = text.strip()
+                            if (len(stripped) > 0) and (stripped[-1] in [".", "?"]):
+                                paragraphs.append(offset + len(text))
+                elif textbox.tag == "figure":
+                    for text_element in textbox:
+                        texts.append(text_element.text)
+                        offsets.append(int(text_element.get("offset")))
+        return {"texts": texts, "offsets": offsets, "pages": pages, "paragraphs": paragraphs}
+
+    def page_number(self, offset: int) -> int:
+        """Returns the page number (starting at 1) of an offset in the derived text
+
+        Args:
+            offset: the offset in the text derived from the formats layer
+
+        Returns:
+            int: the number of pages that start at or before the offset, 0 if
+                the NAF document has no formats layer
+
+        """
+        formats_offsets = self.formats_offsets
+        if formats_offsets is None:
+            return 0
+        return bisect_right(formats_offsets["pages"], offset)
+
+    def paragraph_number(self, offset: int) -> int:
+        """Returns the paragraph number (starting at 1) of an offset in the derived text
+
+        Args:
+            offset: the offset in the text derived from the formats layer
+
+        Returns:
+            int: the number of paragraphs that start at or before the offset, 0
+                if the NAF document has no formats layer
+
+        """
+        formats_offsets = self.formats_offsets
+        if formats_offsets is None:
+            return 0
+        return bisect_right(formats_offsets["paragraphs"], offset)
+
+    def alignment_report(self, raw: str = None, examples: int = 10, max_drift: int = 5) -> dict:
+        """Function to verify the alignment of the text layer with the raw layer
+
+        The offsets, lengths and texts of the word forms are compared with the
+        raw text in bulk with numpy. For each misaligned word form, the
+        smallest shift (up to max_drift characters in both directions) is
+        looked up at which its text does occur in the raw text.
+
+        Args:
+            raw: the raw text, the raw layer of the NAF document if None
+            examples: the maximum number of misaligned word forms in the report
+            max_drift: the maximum shift of the offsets that is looked up
+
+        Returns:
+            dict: with
+                wordforms: the number of word forms
+                mismatches: the number of misaligned word forms
+                examples: the first misaligned word forms as dicts with id,
+                    offset, length, text and the raw text at the offset
+                drift: the number of misaligned word forms per shift
+                unaligned: the number of misaligned word forms of which the
+                    text is not found within max_drift characters
+
+        """
+        if raw is None:
+            raw = self.raw or ""
+        layer = self.find(TEXT_LAYER_TAG)
+        wordforms = list() if layer is None else layer.findall("wf")
+        count = len(wordforms)
+        ids = [wf.get("id") for wf in wordforms]
+        texts = [wf.text or "" for wf in wordforms]
+        offsets = np.fromiter((int(wf.get("offset")) for wf in wordforms), dtype=np.int64, count=count)
+        lengths = np.fromiter((int(wf.get("length")) for wf in wordforms), dtype=np.int64, count=count)
+        text_lengths = np.fromiter(map(len, texts), dtype=np.int64, count=count)
+
+        # one entry per character of the word forms: the word form and the position in the raw text
+        raw_codes = np.frombuffer(raw.encode("utf-32-le"), dtype=np.uint32)
+        text_codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+        owner = np.repeat(np.arange(count), text_lengths)
+        positions = np.arange(len(text_codes)) + np.repeat(
+            offsets - (np.cumsum(text_lengths) - text_lengths), text_lengths
+        )
+
+        def misaligned(shift: int, chars: np.ndarray) -> np.ndarray:
+            # number of characters per word form that differ from the raw text
+            shifted = positions[chars] + shift
+            inside = (shifted >= 0) & (shifted < len(raw_codes))
+            equal = np.zeros(len(shifted), dtype=bool)
+            equal[inside] = raw_codes[shifted[inside]] == text_codes[chars][inside]
+            return np.bincount(owner[chars], weights=~equal, minlength=count) > 0
+
+        all_chars = np.arange(len(text_codes))
+        # the text of a word form must also fit within the raw text and match its length
+        mismatch = (
+            misaligned(0, all_chars)
+            | (lengths != text_lengths)
+            | (offsets < 0)
+            | (offsets + lengths > len(raw_codes))
+        )
+
+        drift = dict()
+        unresolved = mismatch & (lengths == text_lengths)
+        for distance in range(1, max_drift + 1):
+            for shift in [-distance, distance]:
+                chars = np.flatnonzero(unresolved[owner])
+                resolved = unresolved & ~misaligned(shift, chars)
+                if resolved.any():
+                    drift[shift] = int(resolved.sum())
+                    unresolved &= ~resolved
+
+        mismatches = int(mismatch.sum())
+        report = {
+            "wordforms": count,
+            "mismatches": mismatches,
+            "examples": [
                 {
-                    "text": " ".join(paragraph_list),
-                    "para": list(para),
-                    "page": list(pages),
-                    "span": span,
-                    "terms": terms,
-                    "sent": sentence_list
+                    "id": ids[idx],
+                    "offset": int(offsets[idx]),
+                    "length": int(lengths[idx]),
+                    "text": texts[idx],
+                    "raw": raw[offsets[idx]:offsets[idx] + lengths[idx]],
                 }
+                for idx in np.flatnonzero(mismatch)[:examples]
+            ],
+            "drift": drift,
+            "unaligned": mismatches - sum(drift.values()),
+        }
+        return report
+
+    def add_alignment_report(self, report: dict) -> None:
+        """Function to add the summary of an alignment report to the NAF header as comment
+
+        Args:
+            report: the alignment report, see alignment_report
+
+        Returns:
+            None
+
+        """
+        naf_header = self.find(NAF_HEADER)
+        if naf_header is None:
+            logging.warning("no NAF header to add the alignment report to")
+            return None
+        summary = {key: value for key, value in report.items() if key != "examples"}
+        naf_header.append(etree.Comment(prepare_comment_text("alignment: " + json.dumps(summary))))
+        self.invalidate(NAF_HEADER)
+
+    def to_columns(self):
+        """Function to return the token level layers as typed columns
+
+        The columns are numpy arrays built in one pass over the XML and can be
+        converted into pandas without copying, for example
+        pd.DataFrame(columns["text"]) and pd.Categorical.from_codes(
+        columns["terms"]["pos"], columns["categories"]["pos"]). Missing
+        numerical attributes and values are -1. The result is cached and
+        should not be changed.
+
+        Returns:
+            dict: with the following tables as dicts of arrays
+                text: id, text, offset, length, sent, para and page of the word forms
+                terms: id and the codes of type, lemma, pos and morphofeat of the terms
+                spans: the term and wf row numbers of the span targets of the terms
+                entities: id and the code of the type of the entities
+                entity_spans: the entity and term row numbers of the span targets of the entities
+                deps: the from_term and to_term row numbers and the code of rfunc of the dependencies
+                categories: the values of type, lemma, pos, morphofeat, entity_type and rfunc
+
+        """
+        return self._cached("columns", self._columns)
+
+    def _columns(self):
+        wf_columns = {
+            "offset": list(), "length": list(), "sent": list(), "para": list(), "page": list()
+        }
+        wf_ids = list()
+        wf_texts = list()
+        layer = self.find(TEXT_LAYER_TAG)
+        for wf in layer if layer is not None else []:
+            if wf.tag != TEXT_OCCURRENCE_TAG:
+                continue
+            attrib = wf.attrib
+            wf_ids.append(attrib.get("id"))
+            wf_texts.append(wf.text)
+            for key, values in wf_columns.items():
+                values.append(attrib.get(key, "-1"))
+        wf_index = {wf_id: idx for idx, wf_id in enumerate(wf_ids)}
+
+        categories = {"type": dict(), "lemma": dict(), "pos": dict(), "morphofeat": dict()}
+        term_columns = {key: list() for key in categories.keys()}
+        term_ids = list()
+        span_terms = list()
+        span_wfs = list()
+        layer = self.find(TERMS_LAYER_TAG)
+        # the span targets follow the term they belong to in document order
+        elements = layer.iter(TERM_OCCURRENCE_TAG, TARGET_OCCURRENCE_TAG) if layer is not None else []
+        for element in elements:
+            if element.tag == TARGET_OCCURRENCE_TAG:
+                span_terms.append(len(term_ids) - 1)
+                span_wfs.append(wf_index.get(element.get("id"), -1))
+                continue
+            attrib = element.attrib
+            for key, codes in categories.items():
+                value = attrib.get(key)
+                term_columns[key].append(
+                    codes.setdefault(value, len(codes)) if value is not None else -1
+                )
+            term_ids.append(attrib.get("id"))
+        term_index = {term_id: idx for idx, term_id in enumerate(term_ids)}
+
+        entity_types = dict()
+        entity_columns = {"id": list(), "type": list()}
+        entity_spans = {"entity": list(), "term": list()}
+        layer = self.find(ENTITIES_LAYER_TAG)
+        elements = layer.iter(ENTITY_OCCURRENCE_TAG, TARGET_OCCURRENCE_TAG) if layer is not None else []
+        for element in elements:
+            if element.tag == TARGET_OCCURRENCE_TAG:
+                entity_spans["entity"].append(len(entity_columns["id"]) - 1)
+                entity_spans["term"].append(term_index.get(element.get("id"), -1))
+                continue
+            value = element.get("type")
+            entity_columns["type"].append(
+                entity_types.setdefault(value, len(entity_types)) if value is not None else -1
             )
-        return paragraphs
+            entity_columns["id"].append(element.get("id"))
+
+        rfuncs = dict()
+        dep_columns = {"from_term": list(), "to_term": list(), "rfunc": list()}
+        layer = self.find(DEPS_LAYER_TAG)
+        for dep in layer if layer is not None else []:
+            if dep.tag != DEP_OCCURRENCE_TAG:
+                continue
+            dep_columns["from_term"].append(term_index.get(dep.get("from_term"), -1))
+            dep_columns["to_term"].append(term_index.get(dep.get("to_term"), -1))
+            value = dep.get("rfunc")
+            dep_columns["rfunc"].append(rfuncs.setdefault(value, len(rfuncs)) if value is not None else -1)
+        categories["entity_type"] = entity_types
+        categories["rfunc"] = rfuncs
+
+        columns = {
+            "text": {"id": np.array(wf_ids, dtype=object), "text": np.array(wf_texts, dtype=object)},
+            "terms": {"id": np.array(term_ids, dtype=object)},
+            "spans": {
+                "term": np.array(span_terms, dtype=np.int32),
+                "wf": np.array(span_wfs, dtype=np.int32),
+            },
+            "entities": {
+                "id": np.array(entity_columns["id"], dtype=object),
+                "type": np.array(entity_columns["type"], dtype=np.int32),
+            },
+            "entity_spans": {key: np.array(values, dtype=np.int32) for key, values in entity_spans.items()},
+            "deps": {key: np.array(values, dtype=np.int32) for key, values in dep_columns.items()},
+            "categories": {
+                key: np.array(list(codes.keys()), dtype=object) for key, codes in categories.items()
+            },
+        }
+        for key, values in wf_columns.items():
+            columns["text"][key] = np.fromiter(map(int, values), dtype=np.int32, count=len(values))
+        for key, values in term_columns.items():
+            columns["terms"][key] = np.array(values, dtype=np.int32)
+        return columns
 
     @property
     # @TODO: reduce complexity of code
@@ -575,19 +1474,84 @@ class NafDocument(etree._ElementTree):
         else:
             return xml_string.decode("utf-8")
 
-    def validate(self):
-        """Validate xml string of the NAF document"""
-        dtd = load_dtd(NAF_VERSION_TO_DTD[self.get_version()])
-        success = dtd.validate(self.getroot())
+    def validate(self, changed_only: bool = False):
+        """Validate xml string of the NAF document
+
+        With changed_only only the layers that are changed since the last
+        validation are validated, each layer on its own. References to ids
+        in other layers (IDREF) cannot be checked in this mode and are
+        ignored.
+
+        Args:
+            changed_only: if True only the changed layers are validated
+
+        Returns:
+            bool: True if the NAF document is valid
+
+        """
+        dtd = naf_dtd(self.version)
+        if changed_only:
+            changed = self.__dict__.get("_changed_layers", None)
+            errors = list()
+            for layer in self.getroot():
+                if isinstance(layer.tag, str) and (changed is None or layer.tag in changed):
+                    if not dtd.validate(layer):
+                        errors.extend(
+                            error
+                            for error in dtd.error_log.filter_from_errors()
+                            if not is_layer_validation_artifact(error)
+                        )
+            success = len(errors) == 0
+        else:
+            success = dtd.validate(self.getroot())
+            errors = dtd.error_log.filter_from_errors()
+        self.__dict__["_changed_layers"] = set()
         if not success:
             logging.error("DTD error log:")
-            for error in dtd.error_log.filter_from_errors():
+            for error in errors:
                 logging.error(str(error))
             return success
         return success
 
+    def _cached(self, name: str, function):
+        """Return the cached value of a property, computed with function if not cached"""
+        cache = self.__dict__.setdefault("_layer_cache", dict())
+        if name not in cache:
+            cache[name] = function()
+        return cache[name]
+
+    def invalidate(self, layer: str = None):
+        """Remove the cached properties derived from a layer
+
+        The properties text, terms, entities, deps, multiwords, sentences,
+        paragraphs, wf_by_id, term_by_id, terms_by_wf and formats_offsets are
+        cached and the returned lists and dicts should not be changed. The add
+        and remove
+        methods of the NafDocument invalidate the cache; call this function
+        after changing a layer directly with lxml. The layer is also marked
+        as changed for validate(changed_only=True).
+
+        Args:
+            layer: the tag of the layer that is changed, all layers if None
+
+        """
+        if layer is None:
+            self.__dict__["_changed_layers"] = None
+        else:
+            changed = self.__dict__.setdefault("_changed_layers", None)
+            if changed is not None:
+                changed.add(layer)
+        cache = self.__dict__.get("_layer_cache", None)
+        if cache:
+            if layer is None:
+                cache.clear()
+            else:
+                for name in LAYER_CACHE_DEPENDENCIES.get(layer, []):
+                    cache.pop(name, None)
+
     def remove_layer_elements(self, layer: str = None):
         """Remove all elements in layer"""
+        self.invalidate(layer)
         layer = self.find(layer)
         for items in layer:
             layer.remove(items)
@@ -617,8 +1581,37 @@ class NafDocument(etree._ElementTree):
                 del data[key]
         return data
 
+    def element_attributes(self, data, exclude=()):
+        """Return the attributes of a namedtuple as a dict, formatted as in get_attributes"""
+        attributes = dict()
+        for key, value in zip(data._fields, data):
+            if value is None or key in exclude:
+                continue
+            if isinstance(value, str):
+                attributes[key] = value
+            elif isinstance(value, datetime.datetime):
+                attributes[key] = time_in_correct_format(value)
+            elif isinstance(value, (float, int)):
+                attributes[key] = str(value)
+            elif not isinstance(value, list):
+                attributes[key] = value
+        return attributes
+
+    def add_span_elements(self, element, span: list, comment: list = None, naf_version: str = None):
+        """Add a span element with targets, see add_span_element"""
+        if (naf_version is not None) and (naf_version == "v3"):
+            element = etree.SubElement(element, QName(PREFIX_NAF_BASE, "references"))
+        span_element = etree.SubElement(element, QName(PREFIX_NAF_BASE, SPAN_OCCURRENCE_TAG))
+        if comment is not None:
+            span_element.append(etree.Comment(prepare_comment_text(" ".join(comment))))
+        for target in span:
+            etree.SubElement(
+                span_element, QName(PREFIX_NAF_BASE, TARGET_OCCURRENCE_TAG), {"id": target}
+            )
+
     def layer(self, layer_tag: str):
         """ """
+        self.invalidate(layer_tag)
         layer = self.find(layer_tag)
         if layer is None:
             layer = etree.SubElement(
@@ -747,6 +1740,7 @@ class NafDocument(etree._ElementTree):
             endTimestamp CDATA #IMPLIED
             hostname CDATA #IMPLIED
         """
+        self.invalidate(NAF_HEADER)
         proc = self.subelement(
             element=self.find(NAF_HEADER),
             tag=LINGUISTIC_LAYER_TAG,
@@ -779,19 +1773,28 @@ class NafDocument(etree._ElementTree):
             length CDATA #REQUIRED
             xpath CDATA #IMPLIED
         """
-        wf = self.subelement(
-            element=self.layer(TEXT_LAYER_TAG),
-            tag=TEXT_OCCURRENCE_TAG,
-            data=data,
-            attributes_to_ignore=["text"],
-        )
+        self.add_wf_elements([data], cdata)
 
-        wf.text = (
-            etree.CDATA(
-                data.text if "]]>" not in data.text else " " * len(data.text))
-            if cdata
-            else data.text
-        )
+    def add_wf_elements(self, data: list, cdata: bool):
+        """
+        adds wordform elements to the text layer, see add_wf_element
+        Args:
+        data: iterable of WordformElements
+        cdata: if True the text of the word forms is added as CDATA
+        """
+        self.invalidate(TEXT_LAYER_TAG)
+        layer = self.layer(TEXT_LAYER_TAG)
+        tag = QName(PREFIX_NAF_BASE, TEXT_OCCURRENCE_TAG)
+        for wf_data in data:
+            wf = etree.SubElement(
+                layer, tag, self.element_attributes(wf_data, exclude=("text",))
+            )
+            wf.text = (
+                etree.CDATA(
+                    wf_data.text if "]]>" not in wf_data.text else " " * len(wf_data.text))
+                if cdata
+                else wf_data.text
+            )
 
     def add_raw_text_element(self, data: RawElement):
         """
@@ -821,17 +1824,24 @@ class NafDocument(etree._ElementTree):
             rfunc CDATA #REQUIRED
             case CDATA #IMPLIED
         """
-        layer = self.layer(DEPS_LAYER_TAG)
+        self.add_dependency_elements([data], comments)
 
-        if comments:
-            layer.append(etree.Comment(data.comment))
-
-        dep = self.subelement(
-            element=layer,
-            tag=DEP_OCCURRENCE_TAG,
-            data=data,
-            attributes_to_ignore=["comment"],
-        )
+    def add_dependency_elements(self, data: list, comments: bool):
+        """
+        adds dependency elements to the deps layer, see add_dependency_element
+        Args:
+        data: iterable of DependencyRelations
+        comments: if True the comments are added
+        """
+        self.invalidate(DEPS_LAYER_TAG)
+        layer = self.layer(DEPS_LAYER_TAG)
+        tag = QName(PREFIX_NAF_BASE, DEP_OCCURRENCE_TAG)
+        for dep_data in data:
+            if comments:
+                layer.append(etree.Comment(dep_data.comment))
+            etree.SubElement(
+                layer, tag, self.element_attributes(dep_data, exclude=("comment",))
+            )
 
     def add_entity_element(self, data: EntityElement, naf_version: str, comments: str):
         """
@@ -856,18 +1866,33 @@ class NafDocument(etree._ElementTree):
             status CDATA #IMPLIED
             source CDATA #IMPLIED
         """
-        element = self.subelement(
-            element=self.layer(ENTITIES_LAYER_TAG), tag=ENTITY_OCCURRENCE_TAG, data=data
-        )
+        self.add_entity_elements([data], naf_version, comments)
 
-        if data.span != []:
-            self.add_span_element(
-                element=element, data=data, comments=comments, naf_version=naf_version
-            )
+    def add_entity_elements(self, data: list, naf_version: str, comments: str):
+        """
+        adds entity elements to the entities layer, see add_entity_element
+        Args:
+        data: iterable of EntityElements
+        naf_version: the naf version
+        comments: if True the comments are added
+        """
+        self.invalidate(ENTITIES_LAYER_TAG)
+        layer = self.layer(ENTITIES_LAYER_TAG)
+        tag = QName(PREFIX_NAF_BASE, ENTITY_OCCURRENCE_TAG)
+        for entity_data in data:
+            element = etree.SubElement(layer, tag, self.element_attributes(entity_data))
+
+            if entity_data.span != []:
+                self.add_span_elements(
+                    element,
+                    entity_data.span,
+                    entity_data.comment if comments else None,
+                    naf_version,
+                )
 
-        if data.ext_refs != []:
-            self.add_external_reference_element(
-                element=element, ext_refs=data.ext_refs)
+            if entity_data.ext_refs != []:
+                self.add_external_reference_element(
+                    element=element, ext_refs=entity_data.ext_refs)
 
     def add_term_element(
         self, data: TermElement, layer_to_attributes_to_ignore: dict, comments: bool
@@ -904,21 +1929,35 @@ class NafDocument(etree._ElementTree):
             component_of IDREF #IMPLIED
             compound_type CDATA #IMPLIED
         """
-        element = self.subelement(
-            element=self.layer(TERMS_LAYER_TAG),
-            tag=TERM_OCCURRENCE_TAG,
-            data=data,
-            attributes_to_ignore=layer_to_attributes_to_ignore.get(
-                "terms", list()),
-        )
+        self.add_term_elements([data], layer_to_attributes_to_ignore, comments)
 
-        if data.span != []:
-            self.add_span_element(
-                element=element, data=data, comments=comments)
+    def add_term_elements(
+        self, data: list, layer_to_attributes_to_ignore: dict, comments: bool
+    ):
+        """
+        adds term elements to the terms layer, see add_term_element
+        Args:
+        data: iterable of TermElements
+        layer_to_attributes_to_ignore: dict with the attributes to ignore per layer
+        comments: if True the comments are added
+        """
+        self.invalidate(TERMS_LAYER_TAG)
+        layer = self.layer(TERMS_LAYER_TAG)
+        tag = QName(PREFIX_NAF_BASE, TERM_OCCURRENCE_TAG)
+        exclude = tuple(layer_to_attributes_to_ignore.get("terms", list()))
+        for term_data in data:
+            element = etree.SubElement(
+                layer, tag, self.element_attributes(term_data, exclude=exclude)
+            )
 
-        if data.ext_refs != []:
-            self.add_external_reference_element(
-                element=element, ext_refs=data.ext_refs)
+            if term_data.span != []:
+                self.add_span_elements(
+                    element, term_data.span, term_data.comment if comments else None
+                )
+
+            if term_data.ext_refs != []:
+                self.add_external_reference_element(
+                    element=element, ext_refs=term_data.ext_refs)
 
     def add_chunk_element(self, data: ChunkElement, comments: bool):
         """
@@ -1061,6 +2100,9 @@ class NafDocument(etree._ElementTree):
             status CDATA #IMPLIED
             type CDATA #REQUIRED
         """
+        # the highest multiword id is kept, see next_multiword_id
+        max_id = self.__dict__.get("_layer_cache", dict()).get("mw_max_id", None)
+        self.invalidate(MULTIWORDS_LAYER_TAG)
         mw = self.subelement(
             element=self.layer(MULTIWORDS_LAYER_TAG),
             tag=MULTIWORD_OCCURRENCE_TAG,
@@ -1071,6 +2113,33 @@ class NafDocument(etree._ElementTree):
                 element=mw, tag=COMPONENT_OCCURRENCE_TAG, data=component
             )
             self.add_span_element(element=com, data=component)
+        if max_id is not None:
+            self.__dict__["_layer_cache"]["mw_max_id"] = max(max_id, multiword_number(data.id))
+
+    def next_multiword_id(self) -> str:
+        """Returns a new multiword id
+
+        The highest multiword id of the multiwords layer is determined once and
+        kept with the cached layers: it is updated by add_multiword_element and
+        every call returns a new id, also if the multiword is not added yet.
+        The id is determined again if the multiwords layer is invalidated.
+
+        Returns:
+            str: the multiword id (mw followed by a number)
+
+        """
+        max_id = self._cached("mw_max_id", self._mw_max_id) + 1
+        self.__dict__["_layer_cache"]["mw_max_id"] = max_id
+        return "mw" + str(max_id)
+
+    def _mw_max_id(self):
+        layer = self.find(MULTIWORDS_LAYER_TAG)
+        if layer is None:
+            return 0
+        return max(
+            (multiword_number(mw.get("id")) for mw in layer.iter(MULTIWORD_OCCURRENCE_TAG)),
+            default=0,
+        )
 
     def add_formats_copy_element(self, source: str, formats: str):
         """
@@ -1088,6 +2157,7 @@ class NafDocument(etree._ElementTree):
             formats_root = etree.fromstring(formats, parser=parser)
 
             # add formatslayer to the Naf.Document if not already exist
+            self.invalidate(FORMATS_LAYER_COPY_TAG)
             layer = self.find(FORMATS_LAYER_COPY_TAG)
 
             if layer is None:
@@ -1099,12 +2169,39 @@ class NafDocument(etree._ElementTree):
             for page_element in formats_root:
                 layer.append(deepcopy(page_element))
 
+    def formats_page_handler(self, coordinates: bool, pdf_tables: camelot.core.TableList = None, copy: bool = False):
+        """
+        returns a function that adds one page of pdfminer xml output at a time to the formats layer.
+        Args:
+        coordinates: if True bbox information is added to the formats layer.
+        pdf_tables: raw output of camelot
+        copy: if True the pages are also added to the formats_copy layer
+
+        The returned function takes the xml of a single page element (bytes), so
+        that the pdfminer output of the whole document is never held in memory.
+        """
+        builder = PdfFormatsBuilder(
+            self.layer(FORMATS_LAYER_TAG), coordinates, pdf_tables)
+        parser = etree.XMLParser(ns_clean=True, recover=True, encoding="utf-8")
+
+        def add_page(page_xml: bytes):
+            page = etree.fromstring(page_xml, parser=parser)
+            builder.add_page(page)
+            if copy:
+                # keep the newline that follows each page in the pdfminer output
+                page.tail = "\n"
+                self.layer(FORMATS_LAYER_COPY_TAG).append(page)
+
+        return add_page
+
     def add_formats_element(self, source: str, formats: str, coordinates: bool, pdf_tables: camelot.core.TableList = None):
         """
         adds the formats layer.
         Args
-        source: document type (e.g. pdf or docx)
-        formats: raw output of pdfminer
+        source: document type (e.g. pdf, ocr or docx)
+        formats: raw output of pdfminer, or for ocr the list of pages with the width, height
+            and dpi of the image and the words grouped in textboxes and textlines
+            (see ocrprocessor.convert_ocr_pdf)
         coordinates: if True bbox information is added to the formats layer.
             In that case the formats layer is generated at character level instead of textline.
         pdf_tables: raw output of camelot
@@ -1117,298 +2214,69 @@ class NafDocument(etree._ElementTree):
                 ns_clean=True, recover=True, encoding="utf-8")
             formats_root = etree.fromstring(formats, parser=parser)
 
-            # add formatslayer to the Naf.Document if not already exist
-            layer = self.find(FORMATS_LAYER_TAG)
-            if layer is None:
-                layer = etree.SubElement(
-                    self.getroot(), QName(PREFIX_NAF_BASE, FORMATS_LAYER_TAG)
-                )
+            builder = PdfFormatsBuilder(
+                self.layer(FORMATS_LAYER_TAG), coordinates, pdf_tables)
+            for page in formats_root:
+                builder.add_page(page)
 
-            def add_element(element, tag):
-                # create a filtered formats element
-                subelement = etree.SubElement(element, tag)
-                for item in element.attrib.keys():
-                    if coordinates:
-                        if item not in ["colourspace", "ncolour"]:
-                            subelement.attrib[item] = element.attrib[item]
-                    else:
-                        if item not in ["bbox", "colourspace", "ncolour"]:
-                            subelement.attrib[item] = element.attrib[item]
-                return subelement
+        elif source == "ocr":
 
-            def add_text_element(element, tag, text, attrib, offset):
-                # add text and attributes to element
-                if (text is not None) and (text.strip() != ""):
-                    text_element = etree.SubElement(element, tag)
-                    for item in attrib.keys():
-                        text_element.attrib[item] = attrib[item]
-                    text_element.text = text
-                    text_element.set("length", str(len(text)))
-                    text_element.set("offset", str(offset))
-
-            def copy_dict(element):
-                # filters element and convert into dictionary
-                if coordinates:
-                    return {
-                        item: element.attrib[item]
-                        for item in element.keys()
-                        if item not in ["colourspace", "ncolour"]
-                    }
-                else:
-                    return {
-                        item: element.attrib[item]
-                        for item in element.keys()
-                        if item not in ["bbox", "colourspace", "ncolour"]
-                    }
-
-            def check_outside_table(char_coor, pdf_tables, page_nr: int = 1):
-                if char_coor is not None and pdf_tables is not None:
-                    cm_x_left = list()
-                    cm_y_bottom = list()
-                    cm_x_right = list()
-                    cm_y_top = list()
-                    for pdf_table in pdf_tables:
-                        if pdf_table.__dict__["page"] == page_nr:
-                            cm_x_left.append(pdf_table.__dict__["_bbox"][0])
-                            cm_y_bottom.append(pdf_table.__dict__["_bbox"][1])
-                            cm_x_right.append(pdf_table.__dict__["_bbox"][2])
-                            cm_y_top.append(pdf_table.__dict__["_bbox"][3])
-                    outside = [char_coor[0] < cm_x_left[i]
-                               or char_coor[0] > cm_x_right[i]
-                               or char_coor[2] > cm_x_right[i]
-                               or char_coor[2] < cm_x_left[i]
-                               or char_coor[1] < cm_y_bottom[i]
-                               or char_coor[1] > cm_y_top[i]
-                               or char_coor[3] > cm_y_top[i]
-                               or char_coor[3] < cm_y_bottom[i] for i in range(0, len(cm_x_left), 1)]
-                    return all(outside)
-                else:
-                    return True
+            layer = self.layer(FORMATS_LAYER_TAG)
 
             offset = 0
-            table_nr = 0
-            previous_outside = False
-            for page_number, page in enumerate(formats_root):
-                page_element = add_element(layer, "page")
-                first_char_on_page = True
-                previous_char_coor = None
-                page_length = 0
-                if coordinates:
-                    page_bbox = page.attrib["bbox"]
-                for page_item in page:
-                    if page_item.tag == "textbox":
-                        page_item_element = add_element(
-                            page_element, page_item.tag)
-                        for textline in page_item:
-                            textline_element = add_element(
-                                page_item_element, textline.tag
-                            )
-                            # check if textline contains characters
-                            if len(textline) > 0:
-                                previous_text = textline[0].text
-                                previous_attrib = copy_dict(textline[0])
-                                if previous_text is None:
-                                    previous_text = ""
-                                # get bbox of character to check if it is part of a table
-                                for idx, char in enumerate(textline[1:]):
-                                    bbox = char.attrib.get("bbox", None)
-                                    if bbox is not None:
-                                        char_coor = [float(i)
-                                                     for i in bbox.split(',')]
-                                        previous_char_coor = char_coor
-                                    else:
-                                        char_coor = previous_char_coor
-                                    outside = check_outside_table(
-                                        char_coor, pdf_tables, page_number + 1)
-                                    if outside:
-                                        # add character to text
-                                        char_attrib = copy_dict(char)
-                                        if previous_attrib == char_attrib:
-                                            if char.text is not None:
-                                                previous_text += char.text
-                                            if idx == len(textline) - 1:
-                                                add_text_element(
-                                                    textline_element,
-                                                    char.tag,
-                                                    previous_text,
-                                                    previous_attrib,
-                                                    offset,
-                                                )
-                                                page_length += len(previous_text)
-                                                offset += len(previous_text)
-
-                                        else:  # when format changes
-
-                                            add_text_element(
-                                                textline_element,
-                                                char.tag,
-                                                previous_text,
-                                                previous_attrib,
-                                                offset,
-                                            )
-                                            if previous_text is not None:
-                                                page_length += len(previous_text)
-                                                offset += len(previous_text)
-                                            previous_text = char.text
-                                            previous_attrib = char_attrib
-                                            # adds a textline element when last character is reached
-                                            if idx == len(textline) - 1:
-                                                add_text_element(
-                                                    textline_element,
-                                                    char.tag,
-                                                    previous_text,
-                                                    previous_attrib,
-                                                    offset,
-                                                )
-                                                if previous_text is not None:
-                                                    page_length += len(previous_text)
-                                                    offset += len(previous_text)
-
-                                        previous_outside = True
-
-                                    else:
-                                        # replace text with text of table
-                                        if table_nr < len(pdf_tables):
-
-                                            if previous_outside or (first_char_on_page and not previous_outside):
-
-                                                textline_element.getparent().remove(textline_element)
-
-                                                table_df_text = pdf_tables[table_nr].__dict__[
-                                                    'df']
-                                                table_rows = table_df_text.apply(
-                                                    lambda x: x.str.cat(sep=' | '), axis=1)
-                                                for table_textline in table_rows:
-                                                    textline_element = add_element(
-                                                        page_item_element, textline.tag
-                                                    )
-                                                    table_textline_text = table_textline.replace(
-                                                        "\n", "")
-                                                    add_text_element(
-                                                        textline_element,
-                                                        'text',
-                                                        table_textline_text,
-                                                        attrib={},
-                                                        offset=offset
-                                                    )
-                                                    offset += len(table_textline_text)
-                                                    page_length += len(
-                                                        table_textline_text)
-
-                                                    offset += 1
-                                                    page_length += 1
-
-                                                table_nr += 1
-
-                                        previous_outside = False
-
-                                        page_length += len(previous_text)
-                                        offset += len(previous_text)
-
-                            # if nothing has been added to the textline_element we remove is
-                            if len(textline_element) == 0:
-                                textline_element.getparent().remove(textline_element)
-                            else:
-                                page_length += 1
-                                offset += 1
-
-                        # if nothing has been added to the page_item_element we remove is
-                        if len(page_item_element) == 0:
-                            page_item_element.getparent().remove(page_item_element)
+            for ocr_page in formats:
+                # convert pixels (top left origin) to points (bottom left origin) like pdfminer
+                scale = 72 / ocr_page["dpi"]
+                page_height = ocr_page["height"]
+
+                def bbox(left, top, width, height):
+                    return ",".join(
+                        "%.3f" % (value * scale)
+                        for value in [left, page_height - top - height, left + width, page_height - top]
+                    )
+
+                page_element = etree.SubElement(layer, "page")
+                page_offset = offset
+                for textbox in ocr_page["textboxes"]:
+                    textbox_element = etree.SubElement(page_element, "textbox")
+                    for textline in textbox:
+                        textline_element = etree.SubElement(textbox_element, "textline")
+                        if coordinates:
+                            # character level, with the bbox of the word divided over the characters
+                            for word_idx, word in enumerate(textline):
+                                if word_idx > 0:
+                                    # the space between words without bbox, like pdfminer
+                                    text_element = etree.SubElement(textline_element, "text")
+                                    text_element.text = " "
+                                    text_element.set("length", "1")
+                                    text_element.set("offset", str(offset))
+                                    offset += 1
+                                char_width = word["width"] / len(word["text"])
+                                for char_idx, char in enumerate(word["text"]):
+                                    text_element = etree.SubElement(textline_element, "text")
+                                    text_element.set("bbox", bbox(
+                                        word["left"] + char_idx * char_width,
+                                        word["top"],
+                                        char_width,
+                                        word["height"]))
+                                    text_element.text = char
+                                    text_element.set("length", "1")
+                                    text_element.set("offset", str(offset))
+                                    offset += 1
                         else:
-                            page_length += 1
-                            offset += 1
-
-                    elif page_item.tag == "layout":
-
-                        page_length += 1
+                            text = " ".join(word["text"] for word in textline)
+                            text_element = etree.SubElement(textline_element, "text")
+                            text_element.text = text
+                            text_element.set("length", str(len(text)))
+                            text_element.set("offset", str(offset))
+                            offset += len(text)
                         offset += 1
+                    offset += 1
 
-                    elif page_item.tag == "figure":
-
-                        page_item_element = add_element(
-                            page_element, page_item.tag)
-                        if len(page_item) > 0:
-                            previous_text = None
-                            previous_attrib = None
-                            if 0 < len(page_item):
-                                for idx, char in enumerate(page_item):
-                                    if char.tag in ["text", "line"]:
-                                        char_attrib = copy_dict(char)
-                                        if previous_attrib == char_attrib:
-                                            if previous_text is not None:
-                                                previous_text += char.text
-                                            else:
-                                                previous_text = char.text
-                                            if idx == len(page_item) - 1:
-                                                add_text_element(
-                                                    page_item_element,
-                                                    char.tag,
-                                                    previous_text,
-                                                    previous_attrib,
-                                                    offset,
-                                                )
-                                                if previous_text is not None:
-                                                    page_length += len(previous_text)
-                                                    offset += len(previous_text)
-                                        else:  # -> previous_attrib != char_attrib
-                                            add_text_element(
-                                                page_item_element,
-                                                char.tag,
-                                                previous_text,
-                                                previous_attrib,
-                                                offset,
-                                            )
-                                            if previous_text is not None:
-                                                page_length += len(previous_text)
-                                                offset += len(previous_text)
-
-                                            if idx == len(page_item) - 1:
-                                                add_text_element(
-                                                    page_item_element,
-                                                    char.tag,
-                                                    char.text,
-                                                    char_attrib,
-                                                    offset,
-                                                )
-                                                if char.text is not None:
-                                                    page_length += len(char.text)
-                                                    offset += len(char.text)
-                                            else:
-                                                previous_text = char.text
-                                                previous_attrib = char_attrib
-
-                # tables are stored separately in the formats layer
-                if pdf_tables is not None:
-                    table = etree.SubElement(page_element, "tables")
-                    for pdf_table in pdf_tables:
-                        if pdf_table.__dict__['page'] == page_number + 1:
-                            table_on_page = etree.SubElement(
-                                table, "table", attrib={
-                                    "page": str(page_number+1),
-                                    "order": str(pdf_table.__dict__["order"]),
-                                    "shape": str(pdf_table.__dict__["shape"]),
-                                    "_bbox": str(pdf_table.__dict__["_bbox"]),
-                                    "cols": str(pdf_table.__dict__["cols"])
-                                }
-                            )
-                            table_df = pdf_table.__dict__['df']
-                            for idx in table_df.index:
-                                table_row = etree.SubElement(
-                                    table_on_page, "row", attrib={})
-                                table_index = etree.SubElement(
-                                    table_row, "index", attrib={})
-                                table_index.text = str(idx).replace("\n", "")
-                                for col in table_df.columns:
-                                    table_cell = etree.SubElement(
-                                        table_row, "cell", attrib={})
-                                    table_cell.text = str(
-                                        table_df.loc[idx, col]).replace("\n", "")
-
-                page_element.set("length", str(page_length))
-                page_element.set("offset", str(offset - page_length))
+                page_element.set("length", str(offset - page_offset))
+                page_element.set("offset", str(page_offset))
                 if coordinates:
-                    page_element.set("bbox", page_bbox)
+                    page_element.set("bbox", bbox(0, 0, ocr_page["width"], page_height))
 
         elif source == "docx":
 
@@ -1441,11 +2309,7 @@ class NafDocument(etree._ElementTree):
                 ns_clean=True, recover=True, encoding="utf-8")
             formats_root = etree.fromstring(formats, parser=parser)
 
-            layer = self.find(FORMATS_LAYER_TAG)
-            if layer is None:
-                layer = etree.SubElement(
-                    self.getroot(), QName(PREFIX_NAF_BASE, FORMATS_LAYER_TAG)
-                )
+            layer = self.layer(FORMATS_LAYER_TAG)
 
             def add_element(element, tag):
                 subelement = etree.SubElement(element, tag)
@@ -1595,3 +2459,75 @@ class NafDocument(etree._ElementTree):
                 page.set("offset", str(offset - page_length))
 
             # logging.warning("Formats layer for docx not yet implemented.")
+
+
+class StringColumn:
+    """Column of strings stored as utf-8 bytes and the byte offsets of the strings
+
+    The bytes and offsets are numpy arrays that can be memory-mapped; a
+    string is only decoded when it is accessed.
+    """
+
+    dtype = np.dtype(object)
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray) -> None:
+        """Initialize the column with the bytes and the offsets (one more than the number of strings)"""
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return np.array([self[idx] for idx in range(*index.indices(len(self)))], dtype=object)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("string column index out of range")
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return np.array(self.tolist(), dtype=object)
+
+    def tolist(self) -> list:
+        """Return the strings of the column as a list"""
+        return list(self)
+
+
+def read_columns(input: str, mmap_mode: str = "r") -> dict:
+    """Function to read a sidecar directory written with NafDocument.write_columns
+
+    Args:
+        input: the location of the sidecar directory
+        mmap_mode: the mode in which the .npy files are memory-mapped (see numpy.load), None to read them into memory
+
+    Returns:
+        dict: the tables of NafDocument.to_columns, with the version, language, header and raw text;
+            the columns of strings are StringColumns
+
+    """
+    with open(os.path.join(input, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    columns = {
+        "version": meta["version"],
+        "language": meta["language"],
+        "header": meta["header"],
+        "raw": meta["raw"],
+    }
+    for table, names in meta["tables"].items():
+        columns[table] = dict()
+        for name, kind in names.items():
+            location = os.path.join(input, table + "." + name)
+            if kind == "string":
+                columns[table][name] = StringColumn(
+                    np.load(location + ".data.npy", mmap_mode=mmap_mode, allow_pickle=False),
+                    np.load(location + ".offsets.npy", mmap_mode=mmap_mode, allow_pickle=False),
+                )
+            else:
+                columns[table][name] = np.load(location + ".npy", mmap_mode=mmap_mode, allow_pickle=False)
+    return columns
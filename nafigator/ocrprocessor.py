@@ -2,6 +2,8 @@
 
 """OCR module."""
 
+from concurrent.futures import ThreadPoolExecutor
+
 try:
     import pdf2image
 
@@ -27,6 +29,111 @@ except:
     PYTESSERACT = False
 
 
+def ocr_page(path: str = None, page_number: int = 1, dpi: int = 200, ocr=None):
+    """Function to rasterise a single page of a pdf and process ocr on it
+
+    Args:
+        path: location of the file to be converted
+        page_number: the (one-based) number of the page
+        dpi: the resolution of the image of the page
+        ocr: function that is applied to the image, default pytesseract.image_to_string
+
+    Returns:
+        the result of the ocr function
+
+    """
+    if ocr is None:
+        ocr = pytesseract.image_to_string
+    images = pdf2image.convert_from_path(
+        path, dpi=dpi, first_page=page_number, last_page=page_number
+    )
+    result = ocr(images[0])
+    images[0].close()
+    return result
+
+
+def ocr_pages(path: str = None, params: dict = None, ocr=None) -> list:
+    """Function to process ocr on the pages of a pdf, one page at a time
+
+    The pages are rasterised and processed by a pool of workers, so that
+    only the images of the pages that are processed are held in memory.
+
+    Args:
+        path: location of the file to be converted
+        params: the general params dict, the ocr settings are taken from params["ocr_params"]:
+            dpi (default 200), first_page (default 1), last_page (default the last
+            page of the pdf) and workers (default 1)
+        ocr: function that is applied to the image of each page, default pytesseract.image_to_string
+
+    Returns:
+        list: the result of the ocr function for each page, in page order
+
+    """
+    ocr_params = params.get("ocr_params", {}) if params is not None else {}
+    dpi = ocr_params.get("dpi", 200)
+    first_page = ocr_params.get("first_page", 1)
+    last_page = ocr_params.get("last_page", None)
+    if last_page is None:
+        last_page = pdf2image.pdfinfo_from_path(path)["Pages"]
+    workers = ocr_params.get("workers", 1)
+
+    page_numbers = range(first_page, last_page + 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                lambda page_number: ocr_page(path, page_number, dpi, ocr),
+                page_numbers,
+            )
+        )
+
+
+def ocr_page_data(image) -> dict:
+    """Function to process ocr on the image of a page to generate word level data
+
+    Args:
+        image: the image of the page
+
+    Returns:
+        dict: the width and height of the image (in pixels) and the word level
+        data of tesseract (dict with lists for level, block_num, par_num,
+        line_num, word_num, left, top, width, height, conf and text)
+
+    """
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    return {"width": image.width, "height": image.height, "data": data}
+
+
+def ocr_textboxes(data: dict) -> list:
+    """Function to group the words of tesseract word level data into textboxes and textlines
+
+    A textbox corresponds to a paragraph of tesseract.
+
+    Args:
+        data: the word level data of tesseract of a page
+
+    Returns:
+        list: for each textbox a list of textlines, for each textline a list of words
+        (dict with text, left, top, width and height)
+
+    """
+    textboxes = dict()
+    for idx in range(len(data["text"])):
+        text = data["text"][idx]
+        if int(data["level"][idx]) == 5 and text is not None and text.strip() != "":
+            textbox = (int(data["block_num"][idx]), int(data["par_num"][idx]))
+            textline = int(data["line_num"][idx])
+            textboxes.setdefault(textbox, dict()).setdefault(textline, list()).append(
+                {
+                    "text": text.strip(),
+                    "left": int(data["left"][idx]),
+                    "top": int(data["top"][idx]),
+                    "width": int(data["width"][idx]),
+                    "height": int(data["height"][idx]),
+                }
+            )
+    return [list(textlines.values()) for textlines in textboxes.values()]
+
+
 def convert_ocr_pdf(path: str = None, format: str = "text", params: dict = None) -> str:
     """Function to process ocr on pdf to generate text
 
@@ -34,13 +141,34 @@ def convert_ocr_pdf(path: str = None, format: str = "text", params: dict = None)
 
     Args:
         path: location of the file to be converted
-        format: text
-        params: the general params dict to store results
+        format: text or data; with data the words of tesseract grouped in
+            textboxes and textlines (see ocr_textboxes) are stored per page with
+            the width, height and dpi of the image in params["ocrtodata"] (used
+            for the formats layer) and the text is derived from them
+        params: the general params dict to store results, see ocr_pages for the
+            settings in params["ocr_params"]
 
     Returns:
         str: the result of the conversion
 
     """
-    images = pdf2image.convert_from_path(path)
-    text = [pytesseract.image_to_string(image) for page, image in enumerate(images)]
-    return "\n".join(text)
+    if format == "text":
+        text = ocr_pages(path, params)
+        return "\n".join(text)
+    elif format == "data":
+        dpi = params.get("ocr_params", {}).get("dpi", 200)
+        pages = ocr_pages(path, params, ocr=ocr_page_data)
+        for page in pages:
+            page["dpi"] = dpi
+            page["textboxes"] = ocr_textboxes(page.pop("data"))
+        params["ocrtodata"] = pages
+        params["fileDesc"]["pages"] = len(pages)
+        return "\n".join(
+            "\n\n".join(
+                "\n".join(" ".join(word["text"] for word in textline) for textline in textbox)
+                for textbox in page["textboxes"]
+            )
+            for page in pages
+        )
+    else:
+        raise ValueError("provide format, either text or data!")
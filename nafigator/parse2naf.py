@@ -13,12 +13,14 @@ from socket import getfqdn
 from .nafdocument import NafDocument
 from .linguisticprocessor import stanzaProcessor
 from .linguisticprocessor import spacyProcessor
-from .preprocessprocessor import convert_pdf, convert_docx
+from .preprocessprocessor import convert_pdf, convert_pdf_tables, convert_docx
+from .preprocessprocessor import PreprocessCache, PREPROCESS_CACHES, PREPROCESS_CACHE_RESULTS
 from .ocrprocessor import convert_ocr_pdf
 
 from lxml import etree
 import lxml.html
 from typing import Union
+from itertools import islice
 
 from .const import ProcessorElement
 from .const import Entity
@@ -38,6 +40,11 @@ from .utils import remove_illegal_chars
 from .utils import prepare_comment_text
 
 FORMATS_LAYER_TAG = "formats"
+TEXT_LAYER_TAG = "text"
+NAF_HEADER = "nafHeader"
+
+# the layers with a linguistic processor of the nlp engine, in the order of the NAF header
+LINGUISTIC_PROCESSOR_LAYERS = ["entities", "text", "terms", "deps", "multiwords", "chunks", "raw"]
 
 
 def generate_naf(
@@ -51,26 +58,7 @@ def generate_naf(
     nlp=None,
 ):
     """Parse input file, generate and return NAF xml tree"""
-    if input is None:
-        logging.error("input is none")
-        return None
-    if isinstance(input, str) and not os.path.isfile(input) and stream == None:
-        logging.error("no or non-existing input specified")
-        return None
-    if engine is None:
-        logging.error("no engine specified")
-        return None
-    if (language is None) and ("language_detector" not in params.keys()):
-        logging.error("no language or language detector specified")
-        return None
-    if naf_version is None:
-        logging.error("no naf version specified")
-        return None
-    if engine.lower() == "stanza" and "stanza" not in sys.modules:
-        logging.error("stanza not installed")
-        return None
-    if engine.lower() == "spacy" and "spacy" not in sys.modules:
-        logging.error("SpaCy not installed")
+    if not check_input(input, stream, engine, language, naf_version, params):
         return None
 
     params = create_params(
@@ -97,9 +85,172 @@ def generate_naf(
         process_linguistic_steps(params)
         evaluate_naf(params)
 
+    # write the remaining layers if the NAF document is written incrementally
+    write_layers(params)
+
     return params["tree"]
 
 
+def write_layers(params: dict, layers: list = None):
+    """Write layers to params["naf_writer"] and remove them from the tree
+
+    If a NafWriter is given in params["naf_writer"], layers are written as soon
+    as they are no longer needed in the generation of the NAF document, so
+    that the complete tree is never held in memory: the formats layers when
+    the text is derived, the NAF header after the nlp processing (see
+    write_header) and the linguistic layers when they are finished. The DTD
+    validation in evaluate_naf then only applies to the layers that are not
+    yet written, and the alignment report cannot be added to the NAF header.
+    """
+    writer = params.get("naf_writer", None)
+    if writer is not None:
+        params["tree"].write_layers(writer, layers)
+
+
+def generate_naf_many(
+    inputs: list = None,
+    engine: str = None,
+    language: str = None,
+    naf_version: str = None,
+    dtd_validation: bool = False,
+    params: dict = {},
+    nlp=None,
+    batch_size: int = 16,
+    n_process: int = 1,
+):
+    """Parse input files, generate and yield NAF xml trees
+
+    The documents are processed in batches: the preprocessing steps are
+    performed per document, then the texts of the batch are processed by the
+    nlp engine in one go (spaCy nlp.pipe, Stanza bulk processing) and finally
+    the linguistic layers are added per document.
+
+    Args:
+        inputs: iterable of input files (or NafDocuments)
+        engine: the nlp engine (stanza or spacy)
+        language: the language of the documents, if None the language detector in params is used
+        naf_version: the naf version
+        dtd_validation: if True the NAF documents are validated
+        params: the params, used for every document
+        nlp: optional nlp processor or dict of nlp processors with language as key
+        batch_size: the number of documents in a batch
+        n_process: the number of processes of the nlp engine (spaCy only)
+
+    Yields:
+        NafDocument: the NAF xml tree of each input, in order of the inputs
+        (None if the input is not valid)
+
+    """
+    inputs = iter(inputs)
+    engines = dict()
+    while True:
+        batch = list(islice(inputs, batch_size))
+        if len(batch) == 0:
+            return
+
+        batch_params = list()
+        for input in batch:
+            if not check_input(input, None, engine, language, naf_version, params):
+                batch_params.append(None)
+                continue
+            # every document gets its own params, based on the params given
+            doc_params = dict(params)
+            # incremental writing is done per document with generate_naf
+            doc_params.pop("naf_writer", None)
+            for key in ["fileDesc", "public"]:
+                if key in doc_params.keys():
+                    doc_params[key] = dict(doc_params[key])
+            doc_params = create_params(
+                input=input,
+                engine=engine,
+                language=language,
+                naf_version=naf_version,
+                dtd_validation=dtd_validation,
+                params=doc_params,
+                nlp=nlp,
+            )
+            if isinstance(input, NafDocument):
+                doc_params["tree"] = input
+            else:
+                doc_params["tree"] = NafDocument()
+                doc_params["tree"].generate(doc_params)
+            if doc_params["preprocess_layers"] != []:
+                process_preprocess_steps(doc_params)
+            batch_params.append(doc_params)
+
+        # process the texts of the batch per language
+        texts = dict()
+        for idx, doc_params in enumerate(batch_params):
+            if doc_params is not None and doc_params["linguistic_layers"] != []:
+                text = derive_text(doc_params)
+                doc_language = determine_language(doc_params, text)
+                texts.setdefault(doc_language, []).append((idx, text))
+        for doc_language, language_texts in texts.items():
+            if doc_language not in engines.keys():
+                engines[doc_language] = create_engine(engine, nlp, doc_language)
+            if engines[doc_language] is None:
+                for idx, _ in language_texts:
+                    batch_params[idx] = None
+                continue
+            beginTimestamp = datetime.now()
+            docs = list(
+                engines[doc_language].pipe(
+                    [text for _, text in language_texts],
+                    batch_size=batch_size,
+                    n_process=n_process,
+                )
+            )
+            endTimestamp = datetime.now()
+            for (idx, _), doc in zip(language_texts, docs):
+                doc_params = batch_params[idx]
+                doc_params["engine"] = engines[doc_language]
+                doc_params["beginTimestamp"] = beginTimestamp
+                doc_params["doc"] = doc
+                doc_params["endTimestamp"] = endTimestamp
+
+        for doc_params in batch_params:
+            if doc_params is None:
+                yield None
+                continue
+            if doc_params["linguistic_layers"] != []:
+                process_linguistic_layers(doc_params)
+                evaluate_naf(doc_params)
+            yield doc_params["tree"]
+
+
+def check_input(
+    input: Union[str, NafDocument] = None,
+    stream: io.BytesIO = None,
+    engine: str = None,
+    language: str = None,
+    naf_version: str = None,
+    params: dict = {},
+):
+    """Check the arguments of generate_naf, return False (and log an error) if they are not valid"""
+    if input is None:
+        logging.error("input is none")
+        return False
+    if isinstance(input, str) and not os.path.isfile(input) and stream == None:
+        logging.error("no or non-existing input specified")
+        return False
+    if engine is None:
+        logging.error("no engine specified")
+        return False
+    if (language is None) and ("language_detector" not in params.keys()):
+        logging.error("no language or language detector specified")
+        return False
+    if naf_version is None:
+        logging.error("no naf version specified")
+        return False
+    if engine.lower() == "stanza" and "stanza" not in sys.modules:
+        logging.error("stanza not installed")
+        return False
+    if engine.lower() == "spacy" and "spacy" not in sys.modules:
+        logging.error("SpaCy not installed")
+        return False
+    return True
+
+
 def create_params(
     input: str = None,
     stream: io.BytesIO = None,
@@ -208,40 +359,66 @@ def create_params(
         params["apply_ocr"] = False
     if params.get("textline_separator") is None:
         params["textline_separator"] = " "
+    if params.get("alignment_in_header", None) is None:
+        params["alignment_in_header"] = False
+
+    # results of a previous document if params are reused (the preprocess
+    # results, such as pdftoxml, ocrtodata, docxtoxml, text and derived_text)
+    params["preprocess_cache_key"] = None
+    for item in PREPROCESS_CACHE_RESULTS:
+        params.pop(item, None)
 
     return params
 
 
 def evaluate_naf(params: dict):
-    """Perform alignment between raw layer, document text and text layer in the NAF xml tree"""
+    """Perform alignment between raw layer, document text and text layer in the NAF xml tree
+
+    The alignment report of the text layer (see NafDocument.alignment_report)
+    is stored in params["alignment_report"] and, if params["alignment_in_header"]
+    is True, added to the NAF header.
+    """
     # verify alignment between raw layer and document text
     doc_text = params["engine"].document_text(params["doc"])
     raw = params["tree"].raw
     if len(raw) != len(doc_text):
         logging.error(f"raw length ({len(raw)}) != doc length ({len(doc_text)})")
     # verify alignment between raw layer and text
-    text_to_use = derive_text_from_formats_layer(params)
+    text_to_use = params.get("derived_text", None)
+    if text_to_use is None:
+        text_to_use = derive_text_from_formats_layer(params)
     if len(raw) != len(text_to_use):
         logging.error(f"raw length ({len(raw)}) != text to use ({len(text_to_use)})")
     # verify alignment between raw layer and text layer
-    for wf in params["tree"].text:
-        start = int(wf.get("offset"))
-        end = start + int(wf.get("length"))
-        token = raw[start:end]
-        if wf.get("text", None) != token:
-            logging.error(
-                f"mismatch in alignment of wf element [{wf.get('text')}]"
-                f"({wf.get('id')}) with raw layer text [{token}]"
-                f"(expected length {wf.get('length')})"
-            )
+    report = params["tree"].alignment_report(raw)
+    params["alignment_report"] = report
+    if report["mismatches"] > 0:
+        logging.error(
+            f"mismatch in alignment of {report['mismatches']} of {report['wordforms']} "
+            f"wf elements with raw layer text (drift {report['drift']}, "
+            f"{report['unaligned']} unaligned), first mismatches: {report['examples']}"
+        )
+    if params["alignment_in_header"]:
+        params["tree"].add_alignment_report(report)
     # validate naf tree
     if params["dtd_validation"]:
         params["tree"].validate()
 
 
 def process_preprocess_steps(params: dict):
-    """Perform preprocessor steps to generate text as input for linguistic layers"""
+    """Perform preprocessor steps to generate text as input for linguistic layers
+
+    If params["preprocess_cache"] is given, the results are taken from or
+    stored in the preprocess cache (see preprocess_cache).
+    """
     params["beginTimestamp_preprocess"] = datetime.now()
+    cache = preprocess_cache(params)
+    params["preprocess_cache_key"] = cache.key(params) if cache is not None else None
+    if cache is not None and cache.load(params["preprocess_cache_key"], params):
+        params["endTimestamp_preprocess"] = datetime.now()
+        process_preprocess_layers(params)
+        return None
+
     input = params["fileDesc"]["filename"]
     if input[-3:].lower() == "txt":
         stream = params.get("stream", None)
@@ -266,17 +443,66 @@ def process_preprocess_steps(params: dict):
         convert_docx(input, format="text", params=params)
     elif input[-3:].lower() == "pdf":
         if not params["apply_ocr"]:
-            convert_pdf(input, format="xml", params=params)
-            convert_pdf(input, format="text", params=params)
+            if params.get("pdf_streaming", False) and "formats" in params["preprocess_layers"]:
+                # add each page to the formats layer as soon as it is converted
+                convert_pdf_tables(input, params)
+                page_handler = params["tree"].formats_page_handler(
+                    coordinates=params.get("incl_bbox", False),
+                    pdf_tables=params.get("pdftotables", None),
+                    copy=params.get("include pdf xml", False))
+                convert_pdf(input, format=["xml", "text"], params=params, page_handler=page_handler)
+            else:
+                # one pass over the pdf pages for both the xml and the text output
+                convert_pdf(input, format=["xml", "text"], params=params)
         else:
-            params["text"] = convert_ocr_pdf(input, format="text", params=params)
+            # word level ocr data, used for the formats layer
+            params["text"] = convert_ocr_pdf(input, format="data", params=params)
 
     params["endTimestamp_preprocess"] = datetime.now()
 
+    # the results are stored with the derived text if linguistic layers are added
+    if cache is not None and params["linguistic_layers"] == []:
+        cache.store(params["preprocess_cache_key"], params)
+
     # derive preprocess layers from nlp output
     process_preprocess_layers(params)
 
 
+def preprocess_cache(params: dict):
+    """Return the preprocess cache of params["preprocess_cache"], None if not used
+
+    The results of the preprocessing steps and the derived text are stored in
+    the directory params["preprocess_cache"], at most
+    params["preprocess_cache_size"] bytes (default 1 GB). The cache is not
+    used with params["pdf_streaming"], because then the pdf xml is not kept.
+    """
+    directory = params.get("preprocess_cache", None)
+    if directory is None or params.get("pdf_streaming", False):
+        return None
+    # one cache per directory, so that its size is counted once per process
+    if directory not in PREPROCESS_CACHES.keys():
+        PREPROCESS_CACHES[directory] = PreprocessCache(directory)
+    cache = PREPROCESS_CACHES[directory]
+    cache.max_size = params.get("preprocess_cache_size", 2**30)
+    return cache
+
+
+def derive_text(params: dict):
+    """Return the derived text of the document and store it in params["derived_text"]
+
+    The derived text is taken from the preprocess cache if it was found there,
+    otherwise it is derived from the formats layer and added to the cache.
+    """
+    key = params.get("preprocess_cache_key", None)
+    if key is not None and "derived_text" in params.keys():
+        return params["derived_text"]
+    text = derive_text_from_formats_layer(params)
+    params["derived_text"] = text
+    if key is not None:
+        preprocess_cache(params).store(key, params)
+    return text
+
+
 def process_preprocess_layers(params: dict):
     """Perform preprocess layers"""
     layers = params["preprocess_layers"]
@@ -293,96 +519,134 @@ def norm_spaces(s):
 
 def process_linguistic_steps(params: dict):
     """Perform linguistic steps to generate linguistics layers"""
-    engine_name = params["engine_name"]
-    nlp = params["nlp"]
+    text = derive_text(params)
+
+    language = determine_language(params, text)
+
+    # the formats layers are not used once the text is derived (the offsets
+    # of the formats layer are kept in the NafDocument)
+    write_layers(params, [FORMATS_LAYER_TAG, "formats_copy"])
+
+    # create nlp processor
+    params["engine"] = create_engine(params["engine_name"], params["nlp"], language)
+    if params["engine"] is None:
+        return None
+
+    # execute nlp processor pipeline
+    params["beginTimestamp"] = datetime.now()
+    params["doc"] = params["engine"].nlp(text)
+    params["endTimestamp"] = datetime.now()
+
+    write_header(params)
+
+    # derive naf layers from nlp output
+    process_linguistic_layers(params)
+
+
+def write_header(params: dict):
+    """Write the NAF header to params["naf_writer"] before the linguistic layers are added
+
+    The linguistic processors of all linguistic layers are added to the NAF
+    header before it is written, so that the NAF header is the first layer of
+    the output and the linguistic layers can be written as soon as they are
+    finished (see add_linguistic_processor).
+    """
+    if params.get("naf_writer", None) is None:
+        return None
+    for layer in LINGUISTIC_PROCESSOR_LAYERS:
+        if layer in params["linguistic_layers"]:
+            params["tree"].add_processor_element(layer, linguistic_processor(params, layer))
+    write_layers(params, [NAF_HEADER])
 
-    text = derive_text_from_formats_layer(params)
 
-    # determine language for nlp processor
+def linguistic_processor(params: dict, layer: str) -> ProcessorElement:
+    """Return the linguistic processor of the nlp engine for a layer"""
+    return ProcessorElement(
+        name=layer,
+        version=params["engine"].model_version,
+        model=params["engine"].processor(layer).get("model", ""),
+        timestamp=None,
+        beginTimestamp=params["beginTimestamp"],
+        endTimestamp=params["endTimestamp"],
+        hostname=getfqdn(),
+    )
+
+
+def add_linguistic_processor(params: dict, layer: str):
+    """Add the linguistic processor of a layer to the NAF header
+
+    If the NAF header is already written, the processor was added by write_header.
+    """
+    if params["tree"].find(NAF_HEADER) is not None:
+        params["tree"].add_processor_element(layer, linguistic_processor(params, layer))
+
+
+def determine_language(params: dict, text: str):
+    """Return the language of the document, detected from the text if not given in params"""
     if params["language"] is not None:
         language = params["language"]
     else:
         language = params["language_detector"].detect(text)
         params["tree"].set_language(language)
         params["language"] = language
+    return language
 
-    # create nlp processor
+
+def create_engine(engine_name: str, nlp, language: str):
+    """Return the nlp processor of the engine for the language"""
     if engine_name.lower() == "stanza":
         # check if installed
-        params["engine"] = stanzaProcessor(nlp, language)
+        return stanzaProcessor(nlp, language)
     elif engine_name.lower() == "spacy":
         # check if installed
-        params["engine"] = spacyProcessor(nlp, language)
+        return spacyProcessor(nlp, language)
     else:
         logging.error("unknown engine")
         return None
 
-    # execute nlp processor pipeline
-    params["beginTimestamp"] = datetime.now()
-    params["doc"] = params["engine"].nlp(text)
-    params["endTimestamp"] = datetime.now()
-
-    # derive naf layers from nlp output
-    process_linguistic_layers(params)
-
 
 def process_linguistic_layers(params: dict):
     """Perform linguistic layers"""
     layers = params["linguistic_layers"]
 
-    if "entities" in layers:
-        add_entities_layer(params)
-
-    if "text" in layers:
-        add_text_layer(params)
-
-    if "terms" in layers:
-        add_terms_layer(params)
-
-    if "deps" in layers:
-        add_deps_layer(params)
+    # entities, text, terms and deps layers are derived in one walk over the document
+    if any(layer in layers for layer in ["entities", "text", "terms", "deps"]):
+        add_linguistic_layers(params, layers)
 
     if "multiwords" in layers:
         add_multiwords_layer(params)
+        write_layers(params, ["terms", "deps", "multiwords"])
 
     if "chunks" in layers:
         add_chunks_layer(params)
+    write_layers(params, ["chunks"])
 
     if "raw" in layers:
         add_raw_layer(params)
 
 
 def derive_text_from_formats_layer(params):
-    """Derive the text from the xml formats layer"""
-    # @TODO: loops 2 times over this code while generating a naf file
-    formats = params["tree"].find(FORMATS_LAYER_TAG)
+    """Derive the text from the xml formats layer
+
+    The offsets of the formats layer are cached in the NafDocument (see
+    NafDocument.formats_offsets) so that later steps do not have to walk the
+    formats layer again.
+    """
+    formats_offsets = params["tree"].formats_offsets
     textline_separator = params["textline_separator"]
-    if formats is not None:
-        text = []
-        for page in formats:
-            for textbox in page:
-                if textbox.tag == "textbox":
-                    for textline in textbox:
-                        for text_element in textline:
-                            text.append(
-                                (text_element.text, int(text_element.get("offset")))
-                            )
-                elif textbox.tag == "figure":
-                    for text_element in textbox:
-                        text.append(
-                            (text_element.text, int(text_element.get("offset")))
-                        )
+    if formats_offsets is not None:
+        texts = formats_offsets["texts"]
+        offsets = formats_offsets["offsets"]
 
         text_spaces_added = [
-            line[0]
+            text
             # calculate the offset difference between end of word and start of next word
-            + textline_separator * (text[idx + 1][1] - text[idx][1] - len(line[0]))
-            for idx, line in enumerate(text)
-            if idx < len(text) - 1
+            + textline_separator * (offsets[idx + 1] - offsets[idx] - len(text))
+            for idx, text in enumerate(texts[:-1])
         ]
         # add the last line
-        if len(text) > 0:
-            text_spaces_added.append(text[-1][0])
+        if len(texts) > 0:
+            text_spaces_added.append(texts[-1])
 
         text = "".join(text_spaces_added).rstrip()
         if params["replace_hidden_characters"]:
@@ -430,13 +694,23 @@ def chunk_tuples_for_doc(doc, params: dict):
         )
 
 
-def dependencies_to_add(sentence, token, total_tokens: int, params: dict):
-    """Generate list of dependencies to add to deps layer"""
+def dependencies_to_add(sentence, token, total_tokens: int, params: dict, visited: set = None):
+    """Generate list of dependencies to add to deps layer
+
+    The dependencies on the path from the token to the root of the sentence are
+    returned. If visited is given (the indices of the tokens of which the dependency
+    has already been added), the path stops at the first visited token, because the
+    dependencies of that token and its heads have been added before.
+    """
     engine = params["engine"]
     deps = list()
     cor = engine.offset_token_index()
 
     while engine.token_head_index(sentence, token) != engine.token_index(token):
+        if visited is not None:
+            if engine.token_index(token) in visited:
+                break
+            visited.add(engine.token_index(token))
         from_term = "t" + str(
             engine.token_head_index(sentence, token) + total_tokens + cor
         )
@@ -460,87 +734,159 @@ def dependencies_to_add(sentence, token, total_tokens: int, params: dict):
     return deps
 
 
-def add_entities_layer(params: dict):
-    """Generate and add all entities in document to entities layer"""
-    lp = ProcessorElement(
-        name="entities",
-        version=params["engine"].model_version,
-        model=params["engine"].processor("entities").get("model", ""),
-        timestamp=None,
-        beginTimestamp=params["beginTimestamp"],
-        endTimestamp=params["endTimestamp"],
-        hostname=getfqdn(),
-    )
+def add_linguistic_layers(params: dict, layers: list = None):
+    """Generate and add the entities, text, terms and deps layers in a single walk over the document
 
-    params["tree"].add_processor_element("entities", lp)
+    Args:
+        params: the general params dict
+        layers: the layers to add (entities, text, terms and/or deps), all if None
+
+    """
+    layers = [
+        layer
+        for layer in ["entities", "text", "terms", "deps"]
+        if layers is None or layer in layers
+    ]
 
     doc = params["doc"]
     engine = params["engine"]
 
+    tree = params["tree"]
+
+    # the elements of each layer, added to the tree after the walk over the document
+    elements = {layer: list() for layer in layers}
+
+    # the raw text is built from the token offsets in the same walk (see add_raw_layer)
+    raw_tokens = None
+    if "text" in layers and "raw" in params.get("linguistic_layers", []):
+        raw_tokens = list()
+        raw_end = 0
+
     current_entity = list()  # Use a list for multiword entities.
     current_entity_orth = list()  # id.
+    parsing_entity: bool = False
 
     current_token: int = 1  # Keep track of the token number.
     term_number: int = 1  # Keep track of the term number.
     entity_number: int = 1  # Keep track of the entity number.
     total_tokens: int = 0
 
-    parsing_entity: bool = False
-
     for sentence_number, sentence in enumerate(engine.document_sentences(doc), start=1):
 
-        entity_gen = entities_generator(sentence, params)
-        try:
-            next_entity = next(entity_gen)
-        except StopIteration:
-            next_entity = Entity(start=None, end=None, type=None)
+        if "entities" in layers:
+            entity_gen = entities_generator(sentence, params)
+            try:
+                next_entity = next(entity_gen)
+            except StopIteration:
+                next_entity = Entity(start=None, end=None, type=None)
+
+        if "deps" in layers:
+            # indices of the tokens of which the dependency has been added
+            visited = set()
 
         for token_number, token in enumerate(
             engine.sentence_tokens(sentence), start=current_token
         ):
-            # Do we need a state change?
-
-            if token_number == next_entity.start:
-                parsing_entity = True
-
+            wid = "w" + str(token_number + total_tokens)
             tid = "t" + str(term_number)
-            if parsing_entity:
-                current_entity.append(tid)
-                current_entity_orth.append(
-                    normalize_token_orth(engine.token_orth(token))
+
+            if "entities" in layers:
+                # Do we need a state change?
+                if token_number == next_entity.start:
+                    parsing_entity = True
+
+                if parsing_entity:
+                    current_entity.append(tid)
+                    current_entity_orth.append(
+                        normalize_token_orth(engine.token_orth(token))
+                    )
+
+                if parsing_entity and token_number == next_entity.end:
+                    # Create Entity data:
+                    elements["entities"].append(
+                        EntityElement(
+                            id="e" + str(entity_number),
+                            type=next_entity.type,
+                            status=None,
+                            source=None,
+                            span=current_entity,
+                            ext_refs=list(),
+                            comment=current_entity_orth,
+                        )
+                    )
+                    entity_number += 1
+                    current_entity = list()
+                    current_entity_orth = list()
+
+                    # Move to the next entity
+                    parsing_entity = False
+                    try:
+                        next_entity = next(entity_gen)
+                    except StopIteration:
+                        next_entity = Entity(start=None, end=None, type=None)
+
+            if "text" in layers:
+                token_offset = engine.token_offset(token)
+                if raw_tokens is not None:
+                    raw_tokens.append(
+                        raw_token(raw_end, token_offset, token.text, params["cdata"])
+                    )
+                    raw_end = token_offset + len(token.text)
+                elements["text"].append(
+                    WordformElement(
+                        id=wid,
+                        sent=str(sentence_number),
+                        para=str(tree.paragraph_number(token_offset)),
+                        page=str(tree.page_number(token_offset)),
+                        offset=str(token_offset),
+                        length=str(len(token.text)),
+                        xpath=None,
+                        text=token.text,
+                    )
                 )
 
-            # Move to the next term
-            term_number += 1
+            if "terms" in layers:
+                # Create TermElement data:
+                token_pos = engine.token_pos(token)
+                # :param bool map_udpos2naf_pos: if True, we use "udpos2nafpos_info"
+                # to map the Universal Dependencies pos (https://universaldependencies.org/u/pos/)
+                # to the NAF pos tagset
+                if params["map_udpos2olia"]:
+                    if token_pos in udpos2olia.keys():
+                        pos_type = udpos2olia[token_pos]["class"]
+                        token_pos = udpos2olia[token_pos]["olia"]
+                    else:
+                        logging.info("unknown token pos: " + str(token_pos))
+                        pos_type = "open"
+                        token_pos = "unknown"
+                else:
+                    pos_type = "open"
 
-            if parsing_entity and token_number == next_entity.end:
-                # Create new entity ID.
-                entity_id = "e" + str(entity_number)
-                # Create Entity data:
-                entity_data = EntityElement(
-                    id=entity_id,
-                    type=next_entity.type,
-                    status=None,
-                    source=None,
-                    span=current_entity,
-                    ext_refs=list(),
-                    comment=current_entity_orth,
+                elements["terms"].append(
+                    TermElement(
+                        id=tid,
+                        type=pos_type,
+                        lemma=remove_illegal_chars(engine.token_lemma(token)),
+                        pos=token_pos,
+                        morphofeat=engine.token_tag(token),
+                        netype=None,
+                        case=None,
+                        head=None,
+                        component_of=None,
+                        compound_type=None,
+                        span=[wid],
+                        ext_refs=list(),
+                        comment=[normalize_token_orth(engine.token_orth(token))],
+                    )
                 )
 
-                params["tree"].add_entity_element(
-                    entity_data, params["naf_version"], params["language"]
+            if "deps" in layers:
+                elements["deps"].extend(
+                    dependencies_to_add(sentence, token, total_tokens, params, visited)
                 )
 
-                entity_number += 1
-                current_entity = list()
-                current_entity_orth = list()
-
-                # Move to the next entity
-                parsing_entity = False
-                try:
-                    next_entity = next(entity_gen)
-                except StopIteration:
-                    next_entity = Entity(start=None, end=None, type=None)
+            # Move to the next term
+            term_number += 1
 
         if engine.token_reset() is False:
             current_token = token_number + 1
@@ -549,232 +895,63 @@ def add_entities_layer(params: dict):
             current_token = 1
             total_tokens += token_number
 
-    return None
+    # the terms and deps are used by the multiwords layer, the text by the raw
+    # layer and evaluate_naf, the other layers are written when they are added
+    finished = ["entities"]
+    if "multiwords" not in params.get("linguistic_layers", []):
+        finished += ["terms", "deps"]
 
+    for layer in layers:
+        add_linguistic_processor(params, layer)
 
-def add_text_layer(params: dict):
-    """Generate and add all words in document to text layer"""
-    lp = ProcessorElement(
-        name="text",
-        version=params["engine"].model_version,
-        model=params["engine"].processor("text").get("model", ""),
-        timestamp=None,
-        beginTimestamp=params["beginTimestamp"],
-        endTimestamp=params["endTimestamp"],
-        hostname=getfqdn(),
-    )
-
-    params["tree"].add_processor_element("text", lp)
-
-    root = params["tree"].getroot()
-
-    pages_offset = None
-    paragraphs_offset = None
-    formats = root.find(FORMATS_LAYER_TAG)
-    if formats is not None:
-        # calculate offsets
-        pages_offset = [int(page.get("offset")) for page in formats]
-        paragraphs_offset = [0] + [
-            int(text.get("offset")) + len(text.text)
-            for page in formats
-            for textbox in page
-            if textbox.tag == "textbox"
-            for textline in textbox
-            for text in textline
-            if (len(text.text.strip()) > 0) and (text.text.strip()[-1] in [".", "?"])
-        ]
-
-    doc = params["doc"]
-    engine = params["engine"]
-
-    current_token: int = 1
-    total_tokens: int = 0
-    current_page: int = 0
-    current_paragraph: int = 0
-
-    for sentence_number, sentence in enumerate(engine.document_sentences(doc), start=1):
-
-        for token_number, token in enumerate(
-            engine.sentence_tokens(sentence), start=current_token
-        ):
-
-            if (pages_offset is not None) and (current_page < len(pages_offset)):
-                if engine.token_offset(token) >= pages_offset[current_page]:
-                    current_page += 1
-
-            if (paragraphs_offset is not None) and (
-                current_paragraph < len(paragraphs_offset)
-            ):
-                if engine.token_offset(token) >= paragraphs_offset[current_paragraph]:
-                    current_paragraph += 1
-
-            wf_id = "w" + str(token_number + total_tokens)
-            wf_data = WordformElement(
-                id=wf_id,
-                sent=str(sentence_number),
-                para=str(current_paragraph),
-                page=str(current_page),
-                offset=str(engine.token_offset(token)),
-                length=str(len(token.text)),
-                xpath=None,
-                text=token.text,
+        if layer == "entities":
+            params["tree"].add_entity_elements(
+                elements[layer], params["naf_version"], params["language"]
             )
+        elif layer == "text":
+            params["tree"].add_wf_elements(elements[layer], params["cdata"])
+        elif layer == "terms":
+            params["tree"].add_term_elements(
+                elements[layer], params["layer_to_attributes_to_ignore"], params["comments"]
+            )
+        elif layer == "deps":
+            params["tree"].add_dependency_elements(elements[layer], params["comments"])
 
-            params["tree"].add_wf_element(wf_data, params["cdata"])
+        if layer in finished:
+            write_layers(params, [layer])
 
-        if engine.token_reset() is False:
-            current_token = token_number + 1
-            total_tokens = 0
-        else:
-            current_token = 1
-            total_tokens += token_number
+    if raw_tokens is not None:
+        params["raw_tokens"] = raw_tokens
 
     return None
 
 
-def add_terms_layer(params: dict):
-    """Generate and add all terms in document to terms layer"""
-    lp = ProcessorElement(
-        name="terms",
-        version=params["engine"].model_version,
-        model=params["engine"].processor("terms").get("model", ""),
-        timestamp=None,
-        beginTimestamp=params["beginTimestamp"],
-        endTimestamp=params["endTimestamp"],
-        hostname=getfqdn(),
-    )
-
-    params["tree"].add_processor_element("terms", lp)
-
-    doc = params["doc"]
-    engine = params["engine"]
-
-    current_term = list()  # Use a list for multiword expressions.
-    current_term_orth = list()  # id.
-
-    current_token: int = 1  # Keep track of the token number.
-    term_number: int = 1  # Keep track of the term number.
-    total_tokens: int = 0
-
-    for sentence_number, sentence in enumerate(engine.document_sentences(doc), start=1):
-
-        for token_number, token in enumerate(
-            engine.sentence_tokens(sentence), start=current_token
-        ):
-
-            wid = "w" + str(token_number + total_tokens)
-            tid = "t" + str(term_number)
-
-            current_term.append(wid)
-            current_term_orth.append(normalize_token_orth(engine.token_orth(token)))
-
-            # Create TermElement data:
-            token_pos = engine.token_pos(token)
-            # :param bool map_udpos2naf_pos: if True, we use "udpos2nafpos_info"
-            # to map the Universal Dependencies pos (https://universaldependencies.org/u/pos/)
-            # to the NAF pos tagset
-            if params["map_udpos2olia"]:
-                if token_pos in udpos2olia.keys():
-                    pos_type = udpos2olia[token_pos]["class"]
-                    token_pos = udpos2olia[token_pos]["olia"]
-                else:
-                    logging.info("unknown token pos: " + str(token_pos))
-                    pos_type = "open"
-                    token_pos = "unknown"
-            else:
-                pos_type = "open"
-
-            term_data = TermElement(
-                id=tid,
-                type=pos_type,
-                lemma=remove_illegal_chars(engine.token_lemma(token)),
-                pos=token_pos,
-                morphofeat=engine.token_tag(token),
-                netype=None,
-                case=None,
-                head=None,
-                component_of=None,
-                compound_type=None,
-                span=current_term,
-                ext_refs=list(),
-                comment=current_term_orth,
-            )
+def add_entities_layer(params: dict):
+    """Generate and add all entities in document to entities layer"""
+    return add_linguistic_layers(params, ["entities"])
 
-            params["tree"].add_term_element(
-                term_data, params["layer_to_attributes_to_ignore"], params["comments"]
-            )
 
-            # Move to the next term
-            term_number += 1
-            current_term = list()
-            current_term_orth = list()
+def add_text_layer(params: dict):
+    """Generate and add all words in document to text layer"""
+    return add_linguistic_layers(params, ["text"])
 
-        # At the end of the sentence,
-        # add all the dependencies to the XML structure.
-        if engine.token_reset() is False:
-            current_token = token_number + 1
-            total_tokens = 0
-        else:
-            current_token = 1
-            total_tokens += token_number
 
-    return None
+def add_terms_layer(params: dict):
+    """Generate and add all terms in document to terms layer"""
+    return add_linguistic_layers(params, ["terms"])
 
 
 def add_deps_layer(params: dict):
     """Generate and add all dependencies in document to deps layer"""
-    lp = ProcessorElement(
-        name="deps",
-        version=params["engine"].model_version,
-        model=params["engine"].processor("deps").get("model", ""),
-        timestamp=None,
-        beginTimestamp=params["beginTimestamp"],
-        endTimestamp=params["endTimestamp"],
-        hostname=getfqdn(),
-    )
-
-    params["tree"].add_processor_element("deps", lp)
-
-    engine = params["engine"]
-
-    current_token: int = 1
-    total_tokens: int = 0
-
-    for sent in engine.document_sentences(params["doc"]):
-
-        dependencies_for_sentence = list()
-
-        for token_number, token in enumerate(
-            engine.sentence_tokens(sent), start=current_token
-        ):
-            for dep_data in dependencies_to_add(sent, token, total_tokens, params):
-                if dep_data not in dependencies_for_sentence:
-                    dependencies_for_sentence.append(dep_data)
-
-        for dep_data in dependencies_for_sentence:
-            params["tree"].add_dependency_element(dep_data, params["comments"])
-
-        if engine.token_reset() is False:
-            current_token = token_number + 1
-            total_tokens = 0
-        else:
-            current_token = 1
-            total_tokens += token_number
-
-    return None
+    return add_linguistic_layers(params, ["deps"])
 
 
 def get_next_mw_id(params):
-    """Return multiword id for new multiword"""
+    """Return multiword id for new multiword (see NafDocument.next_multiword_id)"""
     layer = params["tree"].find("multiwords")
     if layer is None:
         layer = etree.SubElement(params["tree"].getroot(), "multiwords")
-    mw_ids = [int(mw_el.get("id")[2:]) for mw_el in layer.xpath("mw")]
-    if mw_ids:
-        next_mw_id = max(mw_ids) + 1
-    else:
-        next_mw_id = 1
-    return f"mw{next_mw_id}"
+    return params["tree"].next_multiword_id()
 
 
 def create_separable_verb_lemma(verb, particle, language):
@@ -790,17 +967,7 @@ def create_separable_verb_lemma(verb, particle, language):
 
 def add_multiwords_layer(params: dict):
     """Generate and add all multiwords in document to multiwords layer"""
-    lp = ProcessorElement(
-        name="multiwords",
-        version=params["engine"].model_version,
-        model=params["engine"].processor("multiwords").get("model", ""),
-        timestamp=None,
-        beginTimestamp=params["beginTimestamp"],
-        endTimestamp=params["endTimestamp"],
-        hostname=getfqdn(),
-    )
-
-    params["tree"].add_processor_element("multiwords", lp)
+    add_linguistic_processor(params, "multiwords")
 
     engine = params["engine"]
 
@@ -876,48 +1043,54 @@ def add_multiwords_layer(params: dict):
             # span = etree.SubElement(component, "span")
             # etree.SubElement(span, "target", attrib={"id": t_id})
 
+    # the component_of attributes are set directly on the term elements
+    params["tree"].invalidate("terms")
+
     # params["tree"].add_multi_words(params["naf_version"], params["language"])
 
 
-def add_raw_layer(params: dict):
-    """Generate and add raw text in document to raw layer"""
-    lp = ProcessorElement(
-        name="raw",
-        version=params["engine"].model_version,
-        model=params["engine"].processor("raw").get("model", ""),
-        timestamp=None,
-        beginTimestamp=params["beginTimestamp"],
-        endTimestamp=params["endTimestamp"],
-        hostname=getfqdn(),
-    )
+def raw_token(previous_end: int, offset: int, text: str, cdata: bool = False) -> str:
+    """Return the text of a token preceded by the spaces between the previous token and the token
+
+    Args:
+        previous_end: the offset of the end of the previous token (0 for the first token)
+        offset: the offset of the token
+        text: the text of the token
+        cdata: if True the text is replaced by spaces if it cannot be added as CDATA
+
+    Returns:
+        str: the text of the token in the raw layer
+
+    """
+    if cdata and "]]>" in text:
+        text = " " * len(text)
+    delta = offset - previous_end
+    if delta < 0:
+        logging.warning(
+            f"please check the offsets of {text} and the previous token (delta of {delta})"
+        )
+        return text
+    # 1 or more characters between tokens -> n spaces added
+    return " " * delta + text
 
-    params["tree"].add_processor_element("raw", lp)
-
-    wordforms = params["tree"].text
-
-    if len(wordforms) > 0:
-
-        delta = int(wordforms[0]["offset"])
-        tokens = [" " * delta + wordforms[0]["text"]]
-
-        for prev_wf, cur_wf in zip(wordforms[:-1], wordforms[1:]):
-            prev_start = int(prev_wf["offset"])
-            prev_end = prev_start + int(prev_wf["length"])
-            cur_start = int(cur_wf["offset"])
-            delta = cur_start - prev_end
-            # no chars between two token (for example with a dot .)
-            if delta == 0:
-                leading_chars = ""
-            elif delta >= 1:
-                # 1 or more characters between tokens -> n spaces added
-                leading_chars = " " * delta
-            elif delta < 0:
-                logging.warning(
-                    f"please check the offsets of {prev_wf['text']} and "
-                    f"{cur_wf['text']} (delta of {delta})"
-                )
-            tokens.append(leading_chars + cur_wf["text"])
 
+def add_raw_layer(params: dict):
+    """Generate and add raw text in document to raw layer"""
+    add_linguistic_processor(params, "raw")
+
+    # the raw tokens are built in add_linguistic_layers, otherwise from the text layer
+    tokens = params.pop("raw_tokens", None)
+    if tokens is None:
+        layer = params["tree"].find(TEXT_LAYER_TAG)
+        wordforms = list() if layer is None else layer.findall("wf")
+        tokens = [None] * len(wordforms)
+        raw_end = 0
+        for idx, wf in enumerate(wordforms):
+            offset = int(wf.get("offset"))
+            tokens[idx] = raw_token(raw_end, offset, wf.text, False)
+            raw_end = offset + int(wf.get("length"))
+
+    if len(tokens) > 0:
         if params["cdata"]:
             raw_text = etree.CDATA("".join(tokens))
         else:
@@ -932,17 +1105,7 @@ def add_raw_layer(params: dict):
 
 def add_chunks_layer(params: dict):
     """Generate and add all chunks in document to chunks layer"""
-    lp = ProcessorElement(
-        name="chunks",
-        version=params["engine"].model_version,
-        model=params["engine"].processor("chunks").get("model", ""),
-        timestamp=None,
-        beginTimestamp=params["beginTimestamp"],
-        endTimestamp=params["endTimestamp"],
-        hostname=getfqdn(),
-    )
-
-    params["tree"].add_processor_element("chunks", lp)
+    add_linguistic_processor(params, "chunks")
 
     for chunk_data in chunk_tuples_for_doc(params["doc"], params):
         params["tree"].add_chunk_element(chunk_data, params["comments"])
@@ -972,6 +1135,12 @@ def add_formats_layer(params: dict):
         if params.get("include pdf xml", False):
             params["tree"].add_formats_copy_element("pdf", params["pdftoxml"])
 
+    elif "ocrtodata" in params.keys():
+        params["tree"].add_formats_element(
+            source="ocr",
+            formats=params["ocrtodata"],
+            coordinates=params.get("incl_bbox", False))
+
     elif "docxtoxml" in params.keys():
         params["tree"].add_formats_element(
             source="docx",
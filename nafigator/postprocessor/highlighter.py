@@ -159,7 +159,7 @@ class Highlighter:
                           "The last word id in the document is {self.doc.text[-1]['id']}. \n"
                           "Check if the right id is being used.")
 
-        word_dict = self.doc.text[word_position - 1]
+        word_dict = dict(self.doc.text[word_position - 1])
 
         word_offset = int(word_dict['offset'])
         page_nr = int(word_dict['page'])
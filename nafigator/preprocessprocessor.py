@@ -5,10 +5,22 @@
 from pathlib import Path
 import pdfminer
 from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.converter import PDFLayoutAnalyzer
 from pdfminer.converter import TextConverter, XMLConverter, HTMLConverter
 from pdfminer.layout import LAParams
 from pdfminer.pdfpage import PDFPage
 from io import BytesIO
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import base64
+import pandas as pd
+from typing import Callable, Union
 from .const import ProcessorElement
 
 import docx
@@ -23,71 +35,329 @@ import camelot as cm
 import pdftopng
 
 
+PDF_CONVERTERS = {
+    "text": TextConverter,
+    "html": HTMLConverter,
+    "xml": XMLConverter,
+}
+
+
+class MultiFormatConverter(PDFLayoutAnalyzer):
+    """Converter that writes several output formats from one layout analysis
+
+    Each page is interpreted and laid out once; the resulting LTPage is then
+    rendered by the pdfminer converter of each of the requested formats.
+
+    If a page_handler is given, the xml of each page is passed to it as soon
+    as the page is rendered instead of being added to the xml output stream.
+    """
+
+    def __init__(
+        self,
+        rsrcmgr: PDFResourceManager,
+        outfps: dict,
+        codec: str = "utf-8",
+        laparams: LAParams = None,
+        page_handler: Callable = None,
+        pageno: int = 1,
+    ) -> None:
+        """Initialize the converter
+
+        Args:
+            rsrcmgr: the pdfminer resource manager
+            outfps: dict with format (html, text or xml) as key and output stream as value
+            codec: codec to be used to conversion
+            laparams: the layout analysis parameters
+            page_handler: function that is called with the xml (bytes) of each page
+            pageno: the number of the first page to be converted
+
+        Returns:
+            None
+
+        """
+        super().__init__(rsrcmgr, pageno=pageno, laparams=laparams)
+        self.devices = {
+            format: PDF_CONVERTERS[format](
+                rsrcmgr, outfp, codec=codec, laparams=laparams
+            )
+            for format, outfp in outfps.items()
+        }
+        self.page_handler = page_handler
+
+    def render_page(self, ltpage) -> dict:
+        """Render the laid out page in all formats
+
+        Returns:
+            dict: format as key and the output of the page (bytes) as value
+
+        """
+        page = dict()
+        for format, device in self.devices.items():
+            device.pageno = self.pageno
+            # render the page in a separate stream
+            outfp, device.outfp = device.outfp, BytesIO()
+            device.receive_layout(ltpage)
+            page[format] = device.outfp.getvalue()
+            device.outfp.close()
+            device.outfp = outfp
+        return page
+
+    def write_page(self, page: dict) -> None:
+        """Write the rendered output of a page to the output streams
+
+        Args:
+            page: format as key and the output of the page (bytes) as value
+
+        """
+        for format, device in self.devices.items():
+            if format == "xml" and self.page_handler is not None:
+                self.page_handler(page[format])
+            else:
+                device.outfp.write(page[format])
+
+    def receive_layout(self, ltpage) -> None:
+        """Render the laid out page in all formats"""
+        self.write_page(self.render_page(ltpage))
+
+    def close(self) -> None:
+        """Close the converters of all formats"""
+        for device in self.devices.values():
+            device.close()
+
+
+class PageCollector(MultiFormatConverter):
+    """Converter that keeps the rendered output of each page separately"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Initialize the converter, see MultiFormatConverter"""
+        super().__init__(*args, **kwargs)
+        self.pages = list()
+
+    def receive_layout(self, ltpage) -> None:
+        """Render the laid out page in all formats and keep the output"""
+        self.pages.append(self.render_page(ltpage))
+
+
+def convert_pdf_pages(
+    path: str = None,
+    pagenos: list = None,
+    formats: list = None,
+    codec: str = "utf-8",
+    password: str = "",
+) -> list:
+    """Function to convert a range of pages of a pdf, used by the workers of convert_pdf
+
+    Args:
+        path: location of the file to be converted
+        pagenos: consecutive (zero-based) numbers of the pages to be converted
+        formats: the formats to convert to
+        codec: codec to be used to conversion
+        password: password to be used for conversion
+
+    Returns:
+        list: for each page a dict with format as key and the output of the page as value
+
+    """
+    rsrcmgr = PDFResourceManager()
+    device = PageCollector(
+        rsrcmgr,
+        {f: BytesIO() for f in formats},
+        codec=codec,
+        laparams=LAParams(),
+        pageno=pagenos[0] + 1,
+    )
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    fp = open(path, "rb")
+    for page in PDFPage.get_pages(
+        fp,
+        set(pagenos),
+        maxpages=0,
+        password=password,
+        caching=True,
+        check_extractable=False,
+    ):
+        interpreter.process_page(page)
+    fp.close()
+    return device.pages
+
+
+def convert_pdf_parallel(
+    path: str = None,
+    stream: BytesIO = None,
+    formats: list = None,
+    codec: str = "utf-8",
+    password: str = "",
+    workers: int = 2,
+):
+    """Function to convert the pages of a pdf with a pool of processes
+
+    The pages are divided into ranges of consecutive pages; each range is
+    converted by a separate process. At most workers ranges are converted at
+    the same time, so that the output of only these ranges is held in memory,
+    and the pages are returned in page order as their ranges are finished.
+    The processes read the pages from the file; a stream is first written to
+    a temporary file.
+
+    Args:
+        path: location of the file to be converted
+        stream: stream with the content of the file, used instead of path if not None
+        formats: the formats to convert to
+        codec: codec to be used to conversion
+        password: password to be used for conversion
+        workers: the number of processes
+
+    Returns:
+        generator: for each page, in page order, a dict with format as key
+        and the output of the page as value
+
+    """
+    temporary = None
+    if stream is not None:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            shutil.copyfileobj(stream, f)
+        path = temporary = f.name
+    try:
+        with open(path, "rb") as fp:
+            number_of_pages = sum(
+                1
+                for _ in PDFPage.get_pages(
+                    fp, password=password, check_extractable=False
+                )
+            )
+
+        # more ranges than workers, so that a range with slow pages does not hold up the others
+        size = max(1, -(-number_of_pages // (workers * 4)))
+        ranges = deque(
+            list(range(start, min(start + size, number_of_pages)))
+            for start in range(0, number_of_pages, size)
+        )
+        if len(ranges) == 0:
+            return
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+
+            def submit():
+                return executor.submit(
+                    convert_pdf_pages, path, ranges.popleft(), formats, codec, password
+                )
+
+            futures = deque(submit() for _ in range(min(workers, len(ranges))))
+            while len(futures) > 0:
+                pages = futures.popleft().result()
+                # keep the workers busy while the pages are handled
+                if len(ranges) > 0:
+                    futures.append(submit())
+                yield from pages
+    finally:
+        if temporary is not None:
+            os.remove(temporary)
+
+
 def convert_pdf(
     path: str = None,
-    format: str = "text",
+    format: Union[str, list] = "text",
     codec: str = "utf-8",
     password: str = "",
     params: dict = None,
+    page_handler: Callable = None,
 ) -> str:
     """Function to convert pdf to xml or text
 
     Args:
         path: location of the file to be converted
-        format: html, text or xml
+        format: html, text or xml, or a list of these formats to convert
+            to all of them with a single pass over the pages
         codec: codec to be used to conversion
         password: password to be used for conversion
         params: the general params dict to store results
+        page_handler: function that is called with the xml (bytes) of each
+            page; the xml of the whole document is then not stored in params
+            and the tables are not extracted (see convert_pdf_tables)
+
+    If params["pdf_workers"] is larger than 1, the layout analysis of the
+    pages is done by that number of processes (not for html output).
 
     Returns:
         str: the result of the conversion
 
     """
+    formats = [format] if isinstance(format, str) else list(format)
+    if len(formats) == 0 or any(f not in PDF_CONVERTERS.keys() for f in formats):
+        raise ValueError("provide format, either text, html or xml!")
+    if page_handler is not None and "xml" not in formats:
+        raise ValueError("page_handler requires xml format!")
 
     rsrcmgr = PDFResourceManager()
-    retstr = BytesIO()
+    retstrs = {f: BytesIO() for f in formats}
     laparams = LAParams()
-    if format == "text":
-        device = TextConverter(rsrcmgr, retstr, codec=codec, laparams=laparams)
-    elif format == "html":
-        device = HTMLConverter(rsrcmgr, retstr, codec=codec, laparams=laparams)
-    elif format == "xml":
-        device = XMLConverter(rsrcmgr, retstr, codec=codec, laparams=laparams)
+    workers = params.get("pdf_workers", None)
+    parallel = workers is not None and workers > 1 and "html" not in formats
+    if page_handler is not None or parallel:
+        device = MultiFormatConverter(
+            rsrcmgr, retstrs, codec=codec, laparams=laparams, page_handler=page_handler
+        )
+    elif len(formats) == 1:
+        device = PDF_CONVERTERS[formats[0]](
+            rsrcmgr, retstrs[formats[0]], codec=codec, laparams=laparams
+        )
     else:
-        raise ValueError("provide format, either text, html or xml!")
+        device = MultiFormatConverter(rsrcmgr, retstrs, codec=codec, laparams=laparams)
 
     stream = params.get("stream", None)
-    if stream is not None:
-        fp = stream
-    else:
-        fp = open(path, "rb")
-    interpreter = PDFPageInterpreter(rsrcmgr, device)
-    maxpages = 0
-    caching = True
-    pagenos = set()
     pages = 0
-    for page in PDFPage.get_pages(
-        fp,
-        pagenos,
-        maxpages=maxpages,
-        password=password,
-        caching=caching,
-        check_extractable=False,
-    ):
-        interpreter.process_page(page)
-        pages += 1
+    if parallel:
+        for page in convert_pdf_parallel(
+            path, stream, formats, codec=codec, password=password, workers=workers
+        ):
+            device.write_page(page)
+            pages += 1
+    else:
+        if stream is not None:
+            fp = stream
+        else:
+            fp = open(path, "rb")
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        maxpages = 0
+        caching = True
+        pagenos = set()
+        for page in PDFPage.get_pages(
+            fp,
+            pagenos,
+            maxpages=maxpages,
+            password=password,
+            caching=caching,
+            check_extractable=False,
+        ):
+            interpreter.process_page(page)
+            pages += 1
 
-    if stream is None:
-        fp.close()
+        if stream is None:
+            fp.close()
     device.close()
 
-    text = retstr.getvalue().decode()
-    retstr.close()
-
     params["fileDesc"]["pages"] = pages
 
-    params["pdfto" + format] = text
+    for f in formats:
+        if not (f == "xml" and page_handler is not None):
+            params["pdfto" + f] = retstrs[f].getvalue().decode()
+        retstrs[f].close()
+
+    if page_handler is None:
+        convert_pdf_tables(path, params)
+
+    return None
+
 
+def convert_pdf_tables(path: str = None, params: dict = None) -> None:
+    """Function to extract the tables of a pdf with camelot
+
+    Args:
+        path: location of the file to be converted
+        params: the general params dict to store results
+
+    Returns:
+        None
+
+    """
     if params.get('parse_tables_with_camelot', False):
         camelot_params = params.get('camelot_params', {})
         tables = cm.read_pdf(path,
@@ -154,3 +424,248 @@ def convert_docx(
     params["docxto" + format] = text
 
     return None
+
+
+# the preprocess caches per directory, shared by the documents of a process
+PREPROCESS_CACHES = dict()
+
+PREPROCESS_CACHE_PARAMS = [
+    "incl_bbox",
+    "parse_tables_with_camelot",
+    "camelot_params",
+    "apply_ocr",
+    "ocr_params",
+    "textline_separator",
+    "replace_hidden_characters",
+]
+PREPROCESS_CACHE_RESULTS = [
+    "text",
+    "pdftoxml",
+    "pdftotext",
+    "pdftotables",
+    "docxtoxml",
+    "docxtotext",
+    "ocrtodata",
+    "derived_text",
+]
+
+
+class CachedTable:
+    """Camelot table loaded from the preprocess cache, with the attributes used for the formats layer"""
+
+    def __init__(self, page: int, order: int, shape: tuple, _bbox: tuple, cols: list, df: pd.DataFrame) -> None:
+        self.page = page
+        self.order = order
+        self.shape = shape
+        self._bbox = _bbox
+        self.cols = cols
+        self.df = df
+
+
+def encode_cache_value(item: str, value):
+    """Return a result of the preprocessing steps as JSON serializable value
+
+    Args:
+        item: the name of the result, see PREPROCESS_CACHE_RESULTS
+        value: the result
+
+    Returns:
+        the JSON serializable value
+
+    """
+    if item == "pdftotables":
+        return [
+            {
+                "page": table.__dict__["page"],
+                "order": table.__dict__["order"],
+                "shape": list(table.__dict__["shape"]),
+                "_bbox": list(table.__dict__["_bbox"]),
+                "cols": [list(col) for col in table.__dict__["cols"]],
+                "df": table.__dict__["df"].astype(object).to_dict(orient="split"),
+            }
+            for table in value
+        ]
+    if isinstance(value, bytes):
+        return {"bytes": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def decode_cache_value(item: str, value):
+    """Return a result of the preprocessing steps from its JSON serializable value, see encode_cache_value"""
+    if item == "pdftotables":
+        return [
+            CachedTable(
+                page=table["page"],
+                order=table["order"],
+                shape=tuple(table["shape"]),
+                _bbox=tuple(table["_bbox"]),
+                cols=[tuple(col) for col in table["cols"]],
+                df=pd.DataFrame(**table["df"]),
+            )
+            for table in value
+        ]
+    if isinstance(value, dict) and list(value.keys()) == ["bytes"]:
+        return base64.b64decode(value["bytes"])
+    return value
+
+
+# the fraction of max_size to which the preprocess cache is reduced by eviction
+EVICTION_FRACTION = 0.9
+
+
+class PreprocessCache:
+    """On disk cache of the results of the preprocessing steps
+
+    The results of a document (the pdfminer, docx and ocr output, the camelot
+    tables and the text derived from the formats layer) are stored in one
+    JSON file, keyed by the SHA-256 hash of the input bytes and the params
+    that change the results (PREPROCESS_CACHE_PARAMS). The total size of the
+    files is counted once and then kept up to date by store; if it exceeds
+    max_size, the least recently used files are removed until it is below
+    EVICTION_FRACTION of max_size, so that the directory is only scanned once
+    in many stores.
+
+    The files contain data only (no pickles), so loading a file from the cache
+    directory cannot execute code. The camelot tables are stored with the
+    attributes used for the formats layer and loaded as CachedTable.
+    """
+
+    def __init__(self, directory: str, max_size: int = 2**30) -> None:
+        """Initialize the cache
+
+        Args:
+            directory: the directory in which the results are stored
+            max_size: the maximum total size of the stored results in bytes
+
+        """
+        self.directory = directory
+        self.max_size = max_size
+        # the total size of the files, counted on the first store
+        self.size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, params: dict) -> str:
+        """Return the key of the input document and params
+
+        Args:
+            params: the general params dict with the input in params["fileDesc"]["filename"]
+                and optionally params["stream"]
+
+        Returns:
+            str: the SHA-256 hex digest
+
+        """
+        digest = hashlib.sha256()
+        stream = params.get("stream", None)
+        if stream is not None:
+            position = stream.tell()
+            data = stream.read()
+            stream.seek(position)
+            digest.update(data.encode("utf-8") if isinstance(data, str) else data)
+        else:
+            with open(params["fileDesc"]["filename"], "rb") as f:
+                for block in iter(lambda: f.read(2**20), b""):
+                    digest.update(block)
+        settings = {
+            "extension": os.path.splitext(params["fileDesc"]["filename"])[1].lower(),
+            "params": {item: params.get(item, None) for item in PREPROCESS_CACHE_PARAMS},
+        }
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        """Return the location of the file of a key"""
+        return os.path.join(self.directory, key + ".json")
+
+    def load(self, key: str, params: dict) -> bool:
+        """Load the cached results of a document into params
+
+        Args:
+            key: the key of the document, see key
+            params: the general params dict to store results
+
+        Returns:
+            bool: True if the results were found in the cache
+
+        """
+        path = self.path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as exception:
+            logging.warning(f"cannot read preprocess cache file {path}: {exception}")
+            return False
+        # mark as recently used
+        os.utime(path)
+        for item in PREPROCESS_CACHE_RESULTS:
+            params.pop(item, None)
+        params.update(
+            {item: decode_cache_value(item, value) for item, value in entry["results"].items()}
+        )
+        if entry["pages"] is not None:
+            params["fileDesc"]["pages"] = entry["pages"]
+        return True
+
+    def store(self, key: str, params: dict) -> None:
+        """Store the results of the preprocessing steps in params in the cache
+
+        Args:
+            key: the key of the document, see key
+            params: the general params dict with the results
+
+        Returns:
+            None
+
+        """
+        entry = {
+            "results": {
+                item: encode_cache_value(item, params[item])
+                for item in PREPROCESS_CACHE_RESULTS
+                if item in params.keys()
+            },
+            "pages": params["fileDesc"].get("pages", None),
+        }
+        path = self.path(key)
+        temporary = path + "." + str(os.getpid()) + ".tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temporary, path)
+        except Exception as exception:
+            logging.warning(f"cannot write preprocess cache file {path}: {exception}")
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return None
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.files())
+        else:
+            self.size += os.path.getsize(path) - previous_size
+        if self.size > self.max_size:
+            self.evict()
+
+    def files(self) -> list:
+        """Return the time of last use, size and location of the files in the cache"""
+        files = list()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def evict(self) -> None:
+        """Remove the least recently used files until the total size is at most EVICTION_FRACTION of max_size"""
+        files = self.files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= EVICTION_FRACTION * self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        # the files of other processes are counted as well
+        self.size = total
@@ -34,7 +34,8 @@ def get_terms(pattern, doc):
         list of term satisfying the pattern
 
     """
-    doc_terms = {term["id"]: term for term in doc.terms}
+    # the terms of the NafDocument are cached, so they are copied before adding the text
+    doc_terms = {term["id"]: dict(term) for term in doc.terms}
     doc_words = {word["id"]: word for word in doc.text}
 
     for term in doc_terms.keys():
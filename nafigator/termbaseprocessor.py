@@ -81,9 +81,11 @@ class TermbaseProcessor(object):
         if remove_all_existing_terms:
             for term in doc.xpath("//entity[@type=\'Term\']"):
                 term.getparent().remove(term)
+            doc.invalidate("entities")
 
         doc_word_id = {word['id']: word for word in doc.text}
-        doc_terms = doc.terms
+        # the terms of the NafDocument are cached, so they are copied before adding the text
+        doc_terms = [dict(term) for term in doc.terms]
         for term in doc_terms:
             term['text'] = " ".join([doc_word_id[s['id']]['text'] for s in term['span']])
 
@@ -166,9 +168,11 @@ def process_termbase(doc: NafDocument = None,
     if remove_all_existing_terms:
         for term in doc.xpath("//entity[@type=\'Term\']"):
             term.getparent().remove(term)
+        doc.invalidate("entities")
 
     doc_word_id = {word['id']: word for word in doc.text}
-    doc_terms = doc.terms
+    # the terms of the NafDocument are cached, so they are copied before adding the text
+    doc_terms = [dict(term) for term in doc.terms]
     for term in doc_terms:
         term['text'] = " ".join([doc_word_id[s['id']]['text'] for s in term['span']])
     term_ids = [term['id'] for term in doc_terms]
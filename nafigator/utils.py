@@ -18,7 +18,11 @@ from .const import TermElement
 import docx
 from docx.enum.dml import MSO_THEME_COLOR_INDEX
 import datetime
+import pickle
 from typing import Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 import nafigator
 
 
@@ -31,6 +35,7 @@ def dataframe2naf(
     dtd_validation: bool = False,
     params: dict = {},
     nlp=None,
+    workers: int = None,
 ) -> pd.DataFrame:
     """Batch processor for NAF
 
@@ -42,6 +47,15 @@ def dataframe2naf(
         naf_version: NAF version to be used
         dtd_validation: perform validation of each NAF file (default = False)
         params: additional parameters for NAF conversion
+        nlp: optional NLP processor (or dict of processors per language)
+        workers: number of worker processes; if larger than 1 the documents are
+            processed in a process pool where each worker loads the NLP
+            processors once and reuses them for all its documents (default = None).
+            A given nlp is passed to the worker processes, which requires
+            pickling it if the processes are spawned instead of forked; if the
+            worker processes cannot be started because of this (for example
+            with Stanza pipelines and some spaCy pipelines) the documents are
+            processed sequentially
 
     Returns:
         pd.DataFrame: the dataframe with (updated) metadata
@@ -50,6 +64,8 @@ def dataframe2naf(
     if "naf:status" not in df_meta.columns:
         df_meta["naf:status"] = ""
 
+    tasks = list()
+
     for row in df_meta.index:
 
         if "dc:language" in df_meta.columns:
@@ -98,29 +114,180 @@ def dataframe2naf(
                     for col in df_meta.columns
                     if col not in ["naf:source", "naf:status"]
                 }
-                try:
-                    doc = parse2naf.generate_naf(
-                        input=dc_source,
-                        engine=engine,
-                        language=dc_language,
-                        naf_version=naf_version,
-                        dtd_validation=dtd_validation,
-                        params=params,
-                        nlp=nlp,
+                tasks.append(
+                    (
+                        row,
+                        dc_source,
+                        dc_language,
+                        output,
+                        overwrite_existing_naf,
+                        engine,
+                        naf_version,
+                        dtd_validation,
+                        params,
                     )
-                    if not os.path.exists(output):
-                        doc.write(output)
-                    else:
-                        if overwrite_existing_naf:
-                            doc.write(output)
-                    df_meta.loc[row, "naf:status"] = "OK"
-                    df_meta.loc[row, "naf:source"] = output
-                except:
-                    df_meta.loc[row, "naf:status"] = "ERROR, generate_naf"
+                )
+
+    if workers is None or workers <= 1:
+        for task in tasks:
+            row, status, output = _dataframe2naf_task(*task, nlp=nlp)
+            _set_dataframe2naf_status(df_meta, row, status, output)
+    else:
+        languages = sorted({task[2] for task in tasks})
+        _dataframe2naf_pool(df_meta, tasks, workers, (engine, languages, nlp))
 
     return df_meta
 
 
+# NLP processors per language, loaded once in each dataframe2naf worker process
+_worker_nlp = dict()
+
+
+def _init_dataframe2naf_worker(engine: str, languages: list, nlp=None):
+    """Load the NLP processors of a dataframe2naf worker process
+
+    Args:
+        engine: name of the NLP processor to be used
+        languages: the languages of the documents to be processed
+        nlp: optional NLP processor (or dict of processors per language)
+
+    Returns:
+        None
+
+    """
+    global _worker_nlp
+    _worker_nlp = dict()
+    for language in languages:
+        if isinstance(nlp, dict):
+            if language in nlp.keys():
+                _worker_nlp[language] = nlp[language]
+        elif nlp is not None:
+            _worker_nlp[language] = nlp
+        else:
+            try:
+                if engine.lower() == "stanza":
+                    _worker_nlp[language] = parse2naf.stanzaProcessor(None, language).nlp
+                elif engine.lower() == "spacy":
+                    _worker_nlp[language] = parse2naf.spacyProcessor(None, language).nlp
+            except Exception:
+                # generate_naf will try again and report the error per document
+                logging.error(f"failed to load {engine} processor for {language}")
+
+
+def _dataframe2naf_task(
+    row,
+    dc_source: str,
+    dc_language: str,
+    output: str,
+    overwrite_existing_naf: bool,
+    engine: str,
+    naf_version: str,
+    dtd_validation: bool,
+    params: dict,
+    nlp=None,
+):
+    """Generate and write the NAF file of one row of the dataframe
+
+    Returns:
+        tuple: the row, the naf:status and the naf:source (None if failed)
+
+    """
+    if nlp is None:
+        nlp = _worker_nlp.get(dc_language, None)
+    try:
+        doc = parse2naf.generate_naf(
+            input=dc_source,
+            engine=engine,
+            language=dc_language,
+            naf_version=naf_version,
+            dtd_validation=dtd_validation,
+            params=params,
+            nlp=nlp,
+        )
+        if not os.path.exists(output):
+            doc.write(output)
+        else:
+            if overwrite_existing_naf:
+                doc.write(output)
+        return row, "OK", output
+    except:
+        return row, "ERROR, generate_naf", None
+
+
+def _set_dataframe2naf_status(df_meta: pd.DataFrame, row, status: str, output: str):
+    """Store the result of a dataframe2naf task in the dataframe"""
+    df_meta.loc[row, "naf:status"] = status
+    if output is not None:
+        df_meta.loc[row, "naf:source"] = output
+
+
+def _dataframe2naf_pool(df_meta: pd.DataFrame, tasks: list, workers: int, initargs: tuple):
+    """Process the dataframe2naf tasks in a process pool
+
+    At most workers tasks are submitted at the same time. If a worker process
+    dies (for example by a crash in a pdf library) the pool is broken and all
+    tasks in progress fail; these tasks are then run again each in a separate
+    process, so that only the document that caused the crash gets an error
+    status, and the remaining tasks continue in a new pool. If the worker
+    processes cannot be started because the nlp processor in initargs cannot
+    be pickled, the remaining tasks are run sequentially.
+
+    Args:
+        df_meta: the dataframe containing the meta data for the NAF files.
+        tasks: list of arguments for _dataframe2naf_task
+        workers: number of worker processes
+        initargs: arguments for _init_dataframe2naf_worker
+
+    Returns:
+        None
+
+    """
+    pending = deque(tasks)
+    in_progress = dict()
+    suspects = list()
+    try:
+        while pending:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_dataframe2naf_worker,
+                initargs=initargs,
+            ) as executor:
+                in_progress = dict()
+                while (pending or in_progress) and not suspects:
+                    while pending and len(in_progress) < workers:
+                        future = executor.submit(_dataframe2naf_task, *pending[0])
+                        in_progress[future] = pending.popleft()
+                    done, _ = wait(in_progress, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        task = in_progress.pop(future)
+                        try:
+                            _set_dataframe2naf_status(df_meta, *future.result())
+                        except BrokenProcessPool:
+                            suspects.append(task)
+                suspects.extend(in_progress.values())
+                in_progress = dict()
+
+            while suspects:
+                with ProcessPoolExecutor(
+                    max_workers=1,
+                    initializer=_init_dataframe2naf_worker,
+                    initargs=initargs,
+                ) as executor:
+                    try:
+                        result = executor.submit(_dataframe2naf_task, *suspects[0]).result()
+                    except BrokenProcessPool:
+                        result = (suspects[0][0], "ERROR, generate_naf", None)
+                _set_dataframe2naf_status(df_meta, *result)
+                suspects.pop(0)
+    except (pickle.PicklingError, TypeError, AttributeError) as exception:
+        # the worker processes are spawned and the nlp processor cannot be pickled
+        logging.warning(
+            f"worker processes cannot be started ({exception}), documents are processed sequentially"
+        )
+        for task in list(in_progress.values()) + suspects + list(pending):
+            _set_dataframe2naf_status(df_meta, *_dataframe2naf_task(*task, nlp=initargs[2]))
+
+
 def load_dtd(dtd_url: str) -> etree.DTD:
     """Utility function to load the dtd
 
@@ -132,8 +299,7 @@ def load_dtd(dtd_url: str) -> etree.DTD:
 
     """
     dtd = None
-    r = open(dtd_url)
-    if r:
+    with open(dtd_url) as r:
         dtd_file_object = io.StringIO(r.read())
         dtd = etree.DTD(dtd_file_object)
     if dtd is None:
@@ -0,0 +1,79 @@
+"""Tests for `linguisticprocessor` module"""
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from nafigator.linguisticprocessor import ModelRegistry
+
+unittest.TestLoader.sortTestMethodsUsing = None
+
+
+class countingRegistry(ModelRegistry):
+    """ModelRegistry that counts loads instead of loading models"""
+
+    def __init__(self, maxsize: int = 4) -> None:
+        super().__init__(maxsize)
+        self.loads = []
+
+    def load(self, engine: str, lang: str, processors: str):
+        self.loads.append((engine, lang, processors))
+        return object()
+
+
+class TestModelRegistry(unittest.TestCase):
+    """
+    The basic class that inherits unittest.TestCase
+    """
+
+    def test_get(self):
+        """
+        This function tests whether models are loaded once
+        input: engine, language, processors
+        level: 0
+        scenarios: repeated and concurrent requests for the same model
+        """
+        registry = countingRegistry()
+        model = registry.get("spacy", "en")
+        self.assertIs(registry.get("SpaCy", "en"), model)
+        self.assertIs(registry.get("spacy", "en", "en_core_web_sm"), model)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            models = list(executor.map(lambda _: registry.get("stanza", "nl"), range(8)))
+        self.assertTrue(all(m is models[0] for m in models))
+        self.assertListEqual(
+            registry.loads,
+            [
+                ("spacy", "en", "en_core_web_sm"),
+                ("stanza", "nl", "tokenize,pos,lemma,ner,depparse"),
+            ],
+        )
+
+    def test_lru_eviction(self):
+        """
+        This function tests whether the least recently used model is evicted
+        input: engine, language
+        level: 0
+        scenarios: more models than maxsize
+        """
+        registry = countingRegistry(maxsize=2)
+        registry.preload("stanza", "en")
+        registry.preload("stanza", "nl")
+        registry.get("stanza", "en")
+        registry.get("stanza", "de")
+        self.assertIn(("stanza", "en"), registry)
+        self.assertNotIn(("stanza", "nl"), registry)
+        self.assertIn(("stanza", "de"), registry)
+
+    def test_evict(self):
+        """
+        This function tests whether models are removed from the registry
+        input: engine, language
+        level: 0
+        scenarios: evict by language and evict all
+        """
+        registry = countingRegistry()
+        registry.preload("stanza", "en")
+        registry.preload("stanza", "nl")
+        registry.evict(lang="en")
+        self.assertNotIn(("stanza", "en"), registry)
+        self.assertEqual(len(registry), 1)
+        registry.evict()
+        self.assertEqual(len(registry), 0)
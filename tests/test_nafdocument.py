@@ -78,18 +78,55 @@ class TestNafDocument(unittest.TestCase):
         test sentences output
         input: etree._ElementTree
         level: 0
-        scenarios: test sentences vs input
-        """
-        pass
+        scenarios: test sentences vs input, sentence numbers that do not increase by one
+        """
+        doc = self.text_document()
+        actual = doc.sentences
+        self.assertListEqual([sentence["text"] for sentence in actual], ["The cat", "sat ."])
+        self.assertListEqual([sentence["sent"] for sentence in actual], [["1"], ["3"]])
+        self.assertListEqual(actual[0]["span"], [{"id": "w1"}, {"id": "w2"}])
+        self.assertListEqual(actual[0]["terms"], [{"id": "t1"}, {"id": "t2"}])
+        self.assertListEqual(actual[1]["terms"], [{"id": "t3"}])
+        self.assertListEqual(actual[1]["page"], ["2"])
 
     def test_paragraphs(self):
         """
         test paragraphs output
         input: etree._ElementTree
         level: 0
-        scenarios: test paragraphs vs input
-        """
-        pass
+        scenarios: test paragraphs vs input, document with a single paragraph
+        """
+        doc = self.text_document()
+        actual = doc.paragraphs
+        self.assertEqual(len(actual), 1)
+        self.assertEqual(actual[0]["text"], "The cat sat .")
+        self.assertListEqual(actual[0]["sent"], ["1", "3"])
+        self.assertListEqual(sorted(actual[0]["page"]), ["1", "2"])
+        self.assertListEqual(actual[0]["para"], ["1"])
+
+    def text_document(self):
+        """Returns a NafDocument with a text and terms layer"""
+        from nafigator import NafDocument
+        from nafigator.const import WordformElement, TermElement
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        wfs = [
+            WordformElement(id="w" + str(i), sent=sent, para="1", page=page, offset=str(offset),
+                            length=str(len(text)), xpath=None, text=text)
+            for i, (sent, page, offset, text) in enumerate(
+                [("1", "1", 0, "The"), ("1", "1", 4, "cat"), ("3", "2", 8, "sat"), ("3", "2", 11, ".")], start=1
+            )
+        ]
+        doc.add_wf_elements(wfs, False)
+        terms = [
+            TermElement(id="t" + str(i), type="open", lemma=None, pos=None, morphofeat=None,
+                        netype=None, case=None, head=None, component_of=None, compound_type=None,
+                        span=["w" + str(i)], ext_refs=list(), comment=None)
+            for i in range(1, 4)
+        ]
+        doc.add_term_elements(terms, {}, False)
+        return doc
 
     def test_formats_copy(self):
         """
@@ -109,14 +146,96 @@ class TestNafDocument(unittest.TestCase):
         """
         pass
 
+    def test_page_and_paragraph_number(self):
+        """
+        test page and paragraph of offsets in the derived text
+        input: int
+        level: 0
+        scenarios: offsets on page and paragraph boundaries
+                   several boundaries between two offsets
+                   document without formats layer
+        """
+        from lxml import etree
+        from nafigator import NafDocument
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        formats = doc.layer("formats")
+        for page_offset, texts in [(0, ["One.", "Two."]), (10, ["Three."]), (17, []), (18, ["Four"])]:
+            page = etree.SubElement(formats, "page", {"offset": str(page_offset)})
+            textline = etree.SubElement(etree.SubElement(page, "textbox"), "textline")
+            offset = page_offset
+            for text in texts:
+                etree.SubElement(textline, "text", {"offset": str(offset)}).text = text
+                offset += len(text) + 1
+
+        self.assertEqual(doc.formats_offsets["pages"], [0, 10, 17, 18])
+        self.assertEqual(doc.formats_offsets["paragraphs"], [0, 4, 9, 16])
+        self.assertEqual([doc.page_number(offset) for offset in [0, 5, 10, 18]], [1, 1, 2, 4])
+        self.assertEqual([doc.paragraph_number(offset) for offset in [0, 5, 10, 18]], [1, 2, 3, 4])
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        self.assertEqual(doc.page_number(5), 0)
+        self.assertEqual(doc.paragraph_number(5), 0)
+
+    def test_alignment_report(self):
+        """
+        test alignment of the text layer with the raw layer
+        input: str
+        level: 0
+        scenarios: aligned word forms
+                   word forms with drifted offsets
+                   word forms that do not occur in raw
+                   summary in the NAF header
+        """
+        from nafigator import NafDocument
+        from nafigator.const import RawElement, WordformElement
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        doc.add_raw_text_element(RawElement(text="The cat sat."))
+        doc.add_wf_elements(
+            [
+                WordformElement(
+                    id="w" + str(i), sent="1", para=None, page=None, offset=str(offset),
+                    length=str(len(text)), xpath=None, text=text,
+                )
+                for i, (offset, text) in enumerate([(0, "The"), (4, "dog"), (9, "sat"), (11, ".")])
+            ],
+            False,
+        )
+        report = doc.alignment_report(examples=1)
+        self.assertEqual(report["wordforms"], 4)
+        self.assertEqual(report["mismatches"], 2)
+        self.assertEqual(report["drift"], {-1: 1})
+        self.assertEqual(report["unaligned"], 1)
+        self.assertEqual(
+            report["examples"], [{"id": "w1", "offset": 4, "length": 3, "text": "dog", "raw": "cat"}]
+        )
+
+        doc.add_alignment_report(report)
+        self.assertIn('"mismatches": 2', doc.find("nafHeader")[-1].text)
+
     def test_validate(self):
         """
         test validate output
         input:etree._ElementTree
         level: 1 (uses utilsfunction load_dtd)
-        scenarios: check xml string
+        scenarios: check xml string, cached dtd, validation of changed layers only
         """
-        pass
+        from lxml import etree
+        from nafigator.nafdocument import naf_dtd
+
+        self.assertIs(naf_dtd("v3.1"), naf_dtd("v3.1"))
+
+        doc = self.text_document()
+        self.assertTrue(doc.validate(changed_only=True))
+        # nothing changed since the last validation
+        etree.SubElement(doc.find("terms"), "unknown")
+        self.assertTrue(doc.validate(changed_only=True))
+        doc.invalidate("terms")
+        self.assertFalse(doc.validate(changed_only=True))
 
     def test_get_attributes(self):
         """
@@ -251,3 +370,326 @@ class TestNafDocument(unittest.TestCase):
         scenarios: test elements vs input
         """
         pass
+
+    def test_check_outside_tables(self):
+        """
+        test vectorised check whether characters lie outside the tables on a page
+        input: list of bbox coordinates + page number
+        level: 0
+        scenarios: characters inside, outside, overlapping, without coordinates and on a page without tables
+        """
+        from types import SimpleNamespace
+        from lxml import etree
+        from nafigator.nafdocument import PdfFormatsBuilder
+
+        pdf_tables = [
+            SimpleNamespace(page=1, _bbox=(10.0, 10.0, 50.0, 50.0)),
+            SimpleNamespace(page=1, _bbox=(100.0, 100.0, 200.0, 200.0)),
+        ]
+        builder = PdfFormatsBuilder(etree.Element("formats"), False, pdf_tables)
+        char_coors = [
+            [20.0, 20.0, 30.0, 30.0],
+            [120.0, 120.0, 130.0, 130.0],
+            [60.0, 60.0, 70.0, 70.0],
+            [45.0, 45.0, 55.0, 55.0],
+            None,
+        ]
+        actual = builder.check_outside_tables(char_coors, 1)
+        expected = [False, False, True, True, True]
+        self.assertListEqual(actual.tolist(), expected)
+        actual = builder.check_outside_tables(char_coors, 2)
+        self.assertListEqual(actual.tolist(), [True] * 5)
+
+    def test_add_formats_element_ocr(self):
+        """
+        test added formats element from word level ocr data
+        input: etree._ElementTree + src str + list of pages + bool
+        level: 1
+        scenarios: test offsets and bboxes of the elements
+                   derived text with a non-space textline separator
+        """
+        from nafigator import NafDocument
+        from nafigator.ocrprocessor import ocr_textboxes
+        from nafigator.parse2naf import derive_text_from_formats_layer
+
+        data = {
+            "level": [1, 5, 5, 5],
+            "block_num": [0, 1, 1, 1],
+            "par_num": [0, 1, 1, 1],
+            "line_num": [0, 1, 1, 2],
+            "word_num": [0, 1, 2, 1],
+            "left": [0, 100, 200, 100],
+            "top": [0, 100, 100, 200],
+            "width": [1000, 80, 40, 60],
+            "height": [2000, 20, 20, 20],
+            "conf": [-1, 90, 90, 90],
+            "text": ["", "Text", "is", "here."],
+        }
+        pages = [{"width": 1000, "height": 2000, "dpi": 72, "textboxes": ocr_textboxes(data)}]
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        doc.add_formats_element(source="ocr", formats=pages, coordinates=False)
+        page = doc.find("formats")[0]
+        self.assertEqual(page.attrib, {"length": "15", "offset": "0"})
+        actual = [(t.text, t.get("offset")) for t in page.iter("text")]
+        self.assertListEqual(actual, [("Text is", "0"), ("here.", "8")])
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        doc.add_formats_element(source="ocr", formats=pages, coordinates=True)
+        page = doc.find("formats")[0]
+        self.assertEqual(page.get("bbox"), "0.000,0.000,1000.000,2000.000")
+        chars = list(page.iter("text"))
+        self.assertEqual(len(chars), 12)
+        self.assertEqual((chars[1].text, chars[1].get("offset")), ("e", "1"))
+        self.assertEqual(chars[1].get("bbox"), "120.000,1880.000,140.000,1900.000")
+        self.assertEqual((chars[4].text, chars[4].get("offset"), chars[4].get("bbox")), (" ", "4", None))
+        self.assertEqual((chars[5].text, chars[5].get("offset")), ("i", "5"))
+
+        # the text derived with another textline separator matches the characters
+        params = {"tree": doc, "textline_separator": "|", "replace_hidden_characters": False}
+        self.assertEqual(derive_text_from_formats_layer(params), "Text is|here.")
+
+    def test_add_elements_bulk(self):
+        """
+        test bulk addition of wf, term, dep and entity elements
+        input: etree._ElementTree + iterables of elements
+        level: 1
+        scenarios: same output as addition of single elements
+        """
+        from nafigator import NafDocument
+        from nafigator.const import WordformElement, TermElement, DependencyRelation, EntityElement
+
+        wfs = [
+            WordformElement(id="w" + str(i), sent="1", para="1", page="1", offset=str(4 * i),
+                            length="3", xpath=None, text=text)
+            for i, text in enumerate(["The", "cat", "sat"], start=1)
+        ]
+        terms = [
+            TermElement(id="t" + str(i), type="open", lemma=wf.text.lower(), pos="NOUN", morphofeat="NN",
+                        netype=None, case=None, head=None, component_of=None, compound_type=None,
+                        span=[wf.id], ext_refs=list(), comment=[wf.text])
+            for i, wf in enumerate(wfs, start=1)
+        ]
+        deps = [DependencyRelation(from_term="t3", to_term="t2", rfunc="nsubj", case=None, comment="nsubj(sat,cat)")]
+        entities = [EntityElement(id="e1", type="ORG", status=None, source=None, span=["t2"],
+                                  ext_refs=list(), comment=["cat"])]
+
+        params = {"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}}
+        doc = NafDocument()
+        doc.generate(params)
+        doc.add_entity_elements(entities, "v3.1", True)
+        doc.add_wf_elements(wfs, True)
+        doc.add_term_elements(terms, {"terms": ["morphofeat"]}, True)
+        doc.add_dependency_elements(deps, True)
+
+        # attributes are the same as with get_attributes
+        for layer, data, exclude in [
+            ("entities", entities, []),
+            ("text", wfs, ["text"]),
+            ("terms", terms, ["morphofeat"]),
+            ("deps", deps, ["comment"]),
+        ]:
+            actual = [dict(element.attrib) for element in doc.find(layer) if isinstance(element.tag, str)]
+            expected = [doc.get_attributes(d._asdict(), exclude=exclude) for d in data]
+            self.assertListEqual(actual, expected)
+
+        self.assertListEqual([wf.text for wf in doc.find("text")], ["The", "cat", "sat"])
+        term = doc.find("terms")[1]
+        self.assertEqual(term.find("span")[0].text, "cat")
+        self.assertEqual(term.find("span/target").get("id"), "w2")
+        self.assertEqual(doc.find("entities/entity/span/target").get("id"), "t2")
+        self.assertEqual(doc.find("deps")[0].text, "nsubj(sat,cat)")
+
+    def test_write_layers(self):
+        """
+        test incremental serialization of layers with a NafWriter
+        input: etree._ElementTree + NafWriter
+        level: 1
+        scenarios: written layers are removed from the document and read back unchanged
+            the nafHeader is the first layer and the namespaces are declared once
+        """
+        from io import BytesIO
+        from lxml import etree
+        from nafigator import NafDocument, NafWriter
+        from nafigator.const import WordformElement, RawElement
+
+        params = {"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {"uri": "example.pdf"}}
+        doc = NafDocument()
+        doc.generate(params)
+        doc.add_wf_elements(
+            [WordformElement(id="w1", sent="1", para="1", page="1", offset="0",
+                             length="3", xpath=None, text="The")],
+            False,
+        )
+        doc.add_raw_text_element(RawElement(text="The"))
+        expected = {layer.tag: etree.tostring(layer) for layer in doc.getroot()}
+
+        output = BytesIO()
+        with NafWriter(output) as writer:
+            doc.write_layers(writer, ["text"])
+            self.assertListEqual([layer.tag for layer in doc.getroot()], ["nafHeader", "raw"])
+            doc.write_layers(writer)
+        self.assertEqual(len(doc.getroot()), 0)
+
+        parser = etree.XMLParser(remove_blank_text=True)
+        actual = NafDocument().open(output.getvalue())
+        actual = etree.fromstring(etree.tostring(actual.getroot()), parser)
+        self.assertListEqual([layer.tag for layer in actual], ["nafHeader", "text", "raw"])
+        self.assertEqual(actual.get("{http://www.w3.org/XML/1998/namespace}lang"), "en")
+        self.assertEqual(actual.get("version"), "v3.1")
+        self.assertEqual(output.getvalue().count(b"xmlns:dc"), 1)
+        for layer in actual:
+            self.assertEqual(etree.tostring(layer), expected[layer.tag])
+
+    def test_open_layers(self):
+        """
+        test partial opening of a naf document
+        input: file name or bytes + list of layers to load or to skip
+        level: 1
+        scenarios: only selected layers are loaded and equal to the layers of the complete document
+        """
+        from os.path import join
+        from nafigator import NafDocument
+
+        path = join("tests", "tests", "test3_tabel.naf.xml")
+        expected = NafDocument().open(path)
+
+        actual = NafDocument().open(path, skip=["formats", "formats_copy"])
+        self.assertListEqual(
+            [layer.tag for layer in actual.getroot()],
+            [layer.tag for layer in expected.getroot() if layer.tag not in ["formats", "formats_copy"]],
+        )
+        self.assertEqual(actual.version, expected.version)
+        self.assertEqual(actual.language, expected.language)
+        self.assertListEqual(actual.entities, expected.entities)
+
+        with open(path, "rb") as f:
+            actual = NafDocument().open(f.read(), layers=["nafHeader"])
+        self.assertListEqual([layer.tag for layer in actual.getroot()], ["nafHeader"])
+        self.assertDictEqual(actual.header, expected.header)
+
+        actual = NafDocument().open(path, layers=["terms", "entities"])
+        self.assertListEqual([layer.tag for layer in actual.getroot()], ["entities", "terms"])
+        self.assertListEqual(actual.terms, expected.terms)
+
+    def test_cached_layers(self):
+        """
+        test cached layer properties and id indexes
+        input: etree._ElementTree
+        level: 1
+        scenarios: properties are cached, indexes match the layers and cache is invalidated by mutators
+        """
+        from os.path import join
+        from nafigator import NafDocument
+        from nafigator.const import WordformElement
+
+        doc = NafDocument().open(join("tests", "tests", "test3_tabel.naf.xml"))
+        self.assertIs(doc.text, doc.text)
+        self.assertIs(doc.sentences, doc.sentences)
+
+        wf = doc.text[0]
+        self.assertIs(doc.wf_by_id[wf["id"]], wf)
+        term = doc.terms[0]
+        self.assertIs(doc.term_by_id[term["id"]], term)
+        self.assertListEqual(doc.terms_by_wf[term["span"][0]["id"]], [term])
+
+        text = doc.text
+        length = len(text)
+        doc.add_wf_elements(
+            [WordformElement(id="w_new", sent="1", para="1", page="1", offset="0",
+                             length="3", xpath=None, text="The")],
+            False,
+        )
+        self.assertIsNot(doc.text, text)
+        self.assertEqual(len(doc.text), length + 1)
+        self.assertEqual(doc.wf_by_id["w_new"]["text"], "The")
+
+        doc.remove_layer_elements("terms")
+        self.assertListEqual(doc.terms, [])
+        self.assertDictEqual(doc.terms_by_wf, {})
+
+    def test_to_columns(self):
+        """
+        test columnar arrays of the text and terms layers
+        input: etree._ElementTree
+        level: 1
+        scenarios: columns are typed and equal to the text and terms properties
+        """
+        from os.path import join
+        from nafigator import NafDocument
+
+        doc = NafDocument().open(join("tests", "tests", "test3_tabel.naf.xml"))
+        columns = doc.to_columns()
+
+        text = pd.DataFrame(columns["text"])
+        self.assertEqual(text["offset"].dtype, np.int32)
+        self.assertListEqual(text["id"].tolist(), [wf["id"] for wf in doc.text])
+        self.assertListEqual(text["offset"].tolist(), [int(wf["offset"]) for wf in doc.text])
+        self.assertListEqual(text["sent"].tolist(), [int(wf["sent"]) for wf in doc.text])
+
+        pos = pd.Categorical.from_codes(columns["terms"]["pos"], columns["categories"]["pos"])
+        self.assertListEqual(list(pos), [term["pos"] for term in doc.terms])
+
+        spans = [
+            (columns["terms"]["id"][term], columns["text"]["id"][wf])
+            for term, wf in zip(columns["spans"]["term"], columns["spans"]["wf"])
+        ]
+        expected = [(term["id"], target["id"]) for term in doc.terms for target in term["span"]]
+        self.assertListEqual(spans, expected)
+
+        deps = [
+            (columns["terms"]["id"][from_term], columns["terms"]["id"][to_term], columns["categories"]["rfunc"][rfunc])
+            for from_term, to_term, rfunc in zip(
+                columns["deps"]["from_term"], columns["deps"]["to_term"], columns["deps"]["rfunc"]
+            )
+        ]
+        expected = [(dep["from_term"], dep["to_term"], dep["rfunc"]) for dep in doc.deps]
+        self.assertListEqual(deps, expected)
+
+    def test_write_columns(self):
+        """
+        test binary sidecar directory with the columns of a naf document
+        input: etree._ElementTree + directory
+        level: 1
+        scenarios: columns, header and raw text are read back unchanged
+            columns are memory-mapped
+            columns are opened without parsing the xml
+        """
+        import tempfile
+        from os.path import join
+        from unittest import mock
+        import numpy as np
+        from nafigator import NafDocument, read_columns
+
+        doc = NafDocument().open(join("tests", "tests", "test3_tabel.naf.xml"))
+        with tempfile.TemporaryDirectory() as directory:
+            doc.write_columns(directory)
+            actual = read_columns(directory)
+
+            self.assertEqual(actual["version"], doc.version)
+            self.assertEqual(actual["language"], doc.language)
+            self.assertEqual(actual["raw"], doc.raw)
+            self.assertDictEqual(actual["header"]["fileDesc"], doc.header["fileDesc"])
+            self.assertIsInstance(actual["text"]["offset"], np.memmap)
+            self.assertIsInstance(actual["text"]["text"].data, np.memmap)
+            for table, columns in doc.to_columns().items():
+                for name, expected in columns.items():
+                    self.assertEqual(actual[table][name].dtype, expected.dtype)
+                    self.assertListEqual(actual[table][name].tolist(), expected.tolist())
+            self.assertEqual(actual["text"]["text"][-1], doc.to_columns()["text"]["text"][-1])
+
+            with mock.patch("lxml.etree.parse", side_effect=AssertionError("xml parsed")), mock.patch(
+                "lxml.etree.iterparse", side_effect=AssertionError("xml parsed")
+            ):
+                opened = NafDocument().open_columns(directory)
+                self.assertEqual(opened.version, doc.version)
+                self.assertEqual(opened.language, doc.language)
+                self.assertEqual(opened.raw, doc.raw)
+                self.assertListEqual(
+                    opened.to_columns()["terms"]["pos"].tolist(), doc.to_columns()["terms"]["pos"].tolist()
+                )
+                self.assertListEqual(
+                    opened.to_columns()["text"]["id"].tolist(), doc.to_columns()["text"]["id"].tolist()
+                )
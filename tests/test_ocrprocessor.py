@@ -0,0 +1,134 @@
+"""Tests for `ocrprocessor` module"""
+
+import time
+import unittest
+from types import SimpleNamespace
+from nafigator import ocrprocessor
+from nafigator.ocrprocessor import ocr_pages, convert_ocr_pdf
+
+unittest.TestLoader.sortTestMethodsUsing = None
+
+
+class FakeImage:
+    """Image of a page, as returned by the stub of pdf2image.convert_from_path"""
+
+    def __init__(self, page_number: int, dpi: int):
+        self.page_number = page_number
+        self.dpi = dpi
+        self.width = 10 * page_number
+        self.height = 20 * page_number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def fake_pdf2image(monkeypatch, pages: int = 5):
+    """Replace pdf2image by a stub for a pdf with a number of pages and return the calls"""
+    calls = list()
+
+    def convert_from_path(path, dpi=200, first_page=None, last_page=None):
+        calls.append({"dpi": dpi, "first_page": first_page, "last_page": last_page})
+        # the first pages take the longest, so that pooled results finish out of order
+        time.sleep(0.01 * (pages - first_page))
+        return [FakeImage(page_number, dpi) for page_number in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(
+        ocrprocessor,
+        "pdf2image",
+        SimpleNamespace(
+            convert_from_path=convert_from_path,
+            pdfinfo_from_path=lambda path: {"Pages": pages},
+        ),
+        raising=False,
+    )
+    return calls
+
+
+def fake_ocr(image):
+    """Ocr function that returns the page number and resolution of the image"""
+    return (image.page_number, image.dpi)
+
+
+def test_ocr_pages(monkeypatch):
+    """
+    This function processes ocr on the pages of a pdf, one page at a time.
+    Level: 0
+    Scenarios:
+        all pages in page order with the default resolution
+        one page rasterised per call
+    """
+    calls = fake_pdf2image(monkeypatch, pages=3)
+    assert ocr_pages("example.pdf", {}, ocr=fake_ocr) == [(1, 200), (2, 200), (3, 200)]
+    assert all(call["first_page"] == call["last_page"] for call in calls)
+
+
+def test_ocr_pages_range(monkeypatch):
+    """
+    This function processes ocr on a range of pages of a pdf.
+    Level: 0
+    Scenarios:
+        first_page and last_page limit the pages that are rasterised
+        dpi is passed to the rasterisation
+    """
+    calls = fake_pdf2image(monkeypatch, pages=5)
+    params = {"ocr_params": {"first_page": 2, "last_page": 4, "dpi": 100}}
+    assert ocr_pages("example.pdf", params, ocr=fake_ocr) == [(2, 100), (3, 100), (4, 100)]
+    assert sorted(call["first_page"] for call in calls) == [2, 3, 4]
+    assert all(call["dpi"] == 100 for call in calls)
+
+
+def test_ocr_pages_workers(monkeypatch):
+    """
+    This function processes ocr on the pages of a pdf with a pool of threads.
+    Level: 0
+    Scenarios:
+        output equals the output of the sequential processing, in page order
+    """
+    fake_pdf2image(monkeypatch, pages=5)
+    expected = ocr_pages("example.pdf", {"ocr_params": {"workers": 1}}, ocr=fake_ocr)
+    actual = ocr_pages("example.pdf", {"ocr_params": {"workers": 4}}, ocr=fake_ocr)
+    assert actual == expected
+    assert [page_number for page_number, _ in actual] == [1, 2, 3, 4, 5]
+
+
+def test_convert_ocr_pdf_data(monkeypatch):
+    """
+    This function processes ocr on a pdf to generate word level data.
+    Level: 0
+    Scenarios:
+        word level data per page stored in params["ocrtodata"] with image size and dpi
+        text derived from the words in page order
+    """
+    fake_pdf2image(monkeypatch, pages=3)
+
+    def image_to_data(image, output_type=None):
+        # one paragraph with two lines per page
+        return {
+            "level": [5, 5, 5],
+            "block_num": [1, 1, 1],
+            "par_num": [1, 1, 1],
+            "line_num": [1, 1, 2],
+            "word_num": [1, 2, 1],
+            "left": [0, 10, 0],
+            "top": [0, 0, 10],
+            "width": [5, 5, 5],
+            "height": [5, 5, 5],
+            "conf": [90, 90, 90],
+            "text": ["page", str(image.page_number), "end"],
+        }
+
+    monkeypatch.setattr(
+        ocrprocessor,
+        "pytesseract",
+        SimpleNamespace(image_to_data=image_to_data, Output=SimpleNamespace(DICT="dict")),
+        raising=False,
+    )
+    params = {"fileDesc": {}, "ocr_params": {"first_page": 2, "dpi": 300, "workers": 2}}
+    text = convert_ocr_pdf("example.pdf", format="data", params=params)
+    assert text == "page 2\nend\npage 3\nend"
+    assert params["fileDesc"]["pages"] == 2
+    assert [(page["width"], page["height"], page["dpi"]) for page in params["ocrtodata"]] == [
+        (20, 40, 300),
+        (30, 60, 300),
+    ]
@@ -17,8 +17,17 @@ class TestParse2naf(unittest.TestCase):
         input:  str, str, str, str, bool, params dict, any
         level: 0
         scenarios: input = nafdocument or something else
+                   results of a previous document are removed from reused params
         """
-        pass
+        from nafigator.parse2naf import create_params
+
+        params = {"ocrtodata": [], "pdftoxml": "<pages/>", "docxtoxml": b"", "text": "old", "derived_text": "old"}
+        params = create_params(
+            input="data/example.docx", engine="spacy", language="en", naf_version="v3.1", params=params
+        )
+        for item in ["ocrtodata", "pdftoxml", "docxtoxml", "text", "derived_text"]:
+            self.assertNotIn(item, params)
+        self.assertEqual(params["fileDesc"]["filename"], "data/example.docx")
 
     def test_evaluate_naf(self):
         """
@@ -65,8 +74,31 @@ class TestParse2naf(unittest.TestCase):
         scenarios:  check text with formats
                     check text without formats
                     check for different spaces
+                    check offsets of the formats layer
         """
-        pass
+        from lxml import etree
+        from nafigator import NafDocument
+        from nafigator.parse2naf import derive_text_from_formats_layer
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        formats = doc.layer("formats")
+        page = etree.SubElement(formats, "page", {"offset": "0", "length": "21"})
+        textline = etree.SubElement(etree.SubElement(page, "textbox"), "textline")
+        for offset, text in [(0, "The cat"), (8, "sat."), (14, "Felix")]:
+            etree.SubElement(textline, "text", {"offset": str(offset), "length": str(len(text))}).text = text
+        params = {"tree": doc, "textline_separator": " ", "replace_hidden_characters": False}
+
+        self.assertEqual(derive_text_from_formats_layer(params), "The cat sat.  Felix")
+        self.assertDictEqual(
+            doc.formats_offsets,
+            {"texts": ["The cat", "sat.", "Felix"], "offsets": [0, 8, 14], "pages": [0], "paragraphs": [0, 12]},
+        )
+
+        params = {"tree": NafDocument(), "text": "The cat", "textline_separator": " "}
+        params["tree"].generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        self.assertEqual(derive_text_from_formats_layer(params), "The cat")
+        self.assertIsNone(params["tree"].formats_offsets)
 
     def test_entities_generator(self):
         """tests if start and end are right
@@ -163,9 +195,37 @@ class TestParse2naf(unittest.TestCase):
         test multiword id output
         input: dict
         level: 0
-        scenarios: check ids for multiple input
+        scenarios: check ids for multiple input, document with existing multiwords
+                   multiwords added to the NafDocument, multiwords layer invalidated
         """
-        pass
+        from nafigator import NafDocument
+        from nafigator.parse2naf import get_next_mw_id
+        from nafigator.const import MultiwordElement
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        params = {"tree": doc}
+        self.assertListEqual([get_next_mw_id(params) for _ in range(3)], ["mw1", "mw2", "mw3"])
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        doc.add_multiword_element(
+            MultiwordElement(id="mw7", lemma="set_out", pos="VERB", morphofeat=None, case=None,
+                             status=None, type="phrasal", components=[])
+        )
+        params = {"tree": doc}
+        self.assertEqual(get_next_mw_id(params), "mw8")
+        self.assertEqual(get_next_mw_id(params), "mw9")
+
+        # the highest id is kept on the NafDocument, not in params
+        doc.add_multiword_element(
+            MultiwordElement(id="mw12", lemma="set_up", pos="VERB", morphofeat=None, case=None,
+                             status=None, type="phrasal", components=[])
+        )
+        self.assertEqual(get_next_mw_id({"tree": doc}), "mw13")
+        self.assertEqual(doc.next_multiword_id(), "mw14")
+        doc.remove_layer_elements("multiwords")
+        self.assertEqual(get_next_mw_id(params), "mw1")
 
     def test_add_multiwords_layer(self):
         """
@@ -178,9 +238,189 @@ class TestParse2naf(unittest.TestCase):
 
     def test_raw_layer(self):
         """
-        test multiword output data
+        test raw layer output data
         input: dict
         level: 1
-        scenarios: check multiword layer vs multiword
+        scenarios: check raw layer from the text layer
+                   check raw layer from the tokens of add_linguistic_layers
         """
-        pass
+        from types import SimpleNamespace
+        from nafigator import NafDocument
+        from nafigator.const import WordformElement
+        from nafigator.parse2naf import add_raw_layer, raw_token
+
+        doc = NafDocument()
+        doc.generate({"naf_version": "v3.1", "language": "en", "fileDesc": {}, "public": {}})
+        doc.add_wf_elements(
+            [
+                WordformElement(
+                    id="w" + str(i), sent="1", para=None, page=None, offset=str(offset),
+                    length=str(len(text)), xpath=None, text=text,
+                )
+                for i, (offset, text) in enumerate([(1, "The"), (5, "cat"), (10, "sat"), (13, ".")])
+            ],
+            False,
+        )
+        params = {
+            "tree": doc,
+            "engine": SimpleNamespace(model_version="test", processor=lambda name: {}),
+            "beginTimestamp": None,
+            "endTimestamp": None,
+            "cdata": False,
+        }
+        add_raw_layer(params)
+        self.assertEqual(doc.find("raw").text, " The cat  sat.")
+
+        params["raw_tokens"] = [raw_token(0, 0, "The"), raw_token(3, 4, "dog")]
+        add_raw_layer(params)
+        self.assertEqual(doc.find("raw").text, "The dog")
+        self.assertNotIn("raw_tokens", params)
+
+    def test_generate_naf_many(self):
+        """
+        test generation of naf documents in batches
+        input: list of inputs
+        level: 2
+        scenarios: invalid inputs yield None, in order of the inputs
+        """
+        from nafigator.parse2naf import generate_naf_many
+
+        inputs = ["non-existing-1.pdf", "non-existing-2.txt", "non-existing-3.pdf"]
+        actual = list(
+            generate_naf_many(
+                inputs,
+                engine="spacy",
+                language="en",
+                naf_version="v3.1",
+                params={},
+                batch_size=2,
+            )
+        )
+        self.assertListEqual(actual, [None, None, None])
+
+    def test_generate_naf_many_language_detection(self):
+        """
+        test detection of the language of each document in batches
+        input: list of inputs
+        level: 2
+        scenarios: the language detector is used in every batch
+        """
+        import spacy
+        from types import SimpleNamespace
+        from nafigator.parse2naf import generate_naf_many
+
+        class BlankNLP:
+            def __init__(self, language):
+                self.blank = spacy.blank(language)
+                self.meta = self.blank.meta
+                self.pipeline = [("tagger", SimpleNamespace(model="blank"))]
+
+            def pipe(self, texts, batch_size=None, n_process=1):
+                return self.blank.pipe(texts, batch_size=batch_size, n_process=n_process)
+
+        class AlternatingDetector:
+            def __init__(self):
+                self.calls = 0
+
+            def detect(self, text):
+                self.calls += 1
+                return "en" if self.calls % 2 == 1 else "nl"
+
+        actual = list(
+            generate_naf_many(
+                ["data/example.txt"] * 4,
+                engine="spacy",
+                language=None,
+                naf_version="v3.1",
+                params={"language_detector": AlternatingDetector(), "linguistic_layers": ["raw"]},
+                nlp={"en": BlankNLP("en"), "nl": BlankNLP("nl")},
+                batch_size=2,
+            )
+        )
+        self.assertListEqual([tree.language for tree in actual], ["en", "nl", "en", "nl"])
+
+    def test_generate_naf_writer(self):
+        """
+        test incremental writing of a naf document during its generation
+        input: pdf file + NafWriter
+        level: 2
+        scenarios: the formats layer is written before the nlp processing
+                   the nafHeader with all linguistic processors is the first layer of the output
+                   the namespaces are declared once
+        """
+        import spacy
+        from io import BytesIO
+        from types import SimpleNamespace
+        from lxml import etree
+        from nafigator import NafWriter
+        from nafigator.parse2naf import generate_naf
+
+        written = list()
+
+        class RecordingWriter(NafWriter):
+            def write_layer(self, layer, root_attrib=None):
+                written.append(layer.tag)
+                super().write_layer(layer, root_attrib)
+
+        class BlankNLP:
+            def __init__(self, language):
+                self.blank = spacy.blank(language)
+                self.blank.add_pipe("sentencizer")
+                self.meta = self.blank.meta
+                self.pipeline = [("tagger", SimpleNamespace(model="blank"))]
+
+            def __call__(self, text):
+                written.append("nlp")
+                return self.blank(text)
+
+        output = BytesIO()
+        with RecordingWriter(output) as writer:
+            generate_naf(
+                input="tests/tests/example.pdf",
+                engine="spacy",
+                language="en",
+                naf_version="v3.1",
+                params={"naf_writer": writer, "linguistic_layers": ["text", "raw"]},
+                nlp=BlankNLP("en"),
+            )
+        self.assertListEqual(written, ["formats", "nlp", "nafHeader", "text", "raw"])
+
+        root = etree.fromstring(output.getvalue())
+        self.assertListEqual([layer.tag for layer in root], ["nafHeader", "formats", "text", "raw"])
+        self.assertListEqual(
+            [lp.get("layer") for lp in root.find("nafHeader").findall("linguisticProcessors")],
+            ["formats", "text", "raw"],
+        )
+        self.assertEqual(output.getvalue().count(b"xmlns:dc"), 1)
+
+    def test_dependencies_to_add_visited(self):
+        """
+        test dependencies with visited tokens
+        input: sentence, token, total_tokens, params, visited
+        level: 0
+        scenarios: same dependencies in same order as deduplicated paths to the root
+        """
+        import spacy
+        from spacy.tokens import Doc
+        from nafigator.linguisticprocessor import spacyProcessor
+        from nafigator.parse2naf import dependencies_to_add
+
+        nlp = spacy.blank("en")
+        words = ["w" + str(i) for i in range(8)]
+        heads = [2, 2, 2, 4, 2, 7, 7, 4]
+        deps = ["nsubj", "aux", "ROOT", "det", "obj", "amod", "amod", "nmod"]
+        doc = Doc(nlp.vocab, words=words, heads=heads, deps=deps)
+        params = {"engine": spacyProcessor(nlp, "en")}
+        sentence = list(doc.sents)[0]
+
+        expected = list()
+        for token in sentence:
+            for dep_data in dependencies_to_add(sentence, token, 0, params):
+                if dep_data not in expected:
+                    expected.append(dep_data)
+        visited = set()
+        actual = list()
+        for token in sentence:
+            actual.extend(dependencies_to_add(sentence, token, 0, params, visited))
+        self.assertListEqual(actual, expected)
+        self.assertEqual(len(actual), len(words) - 1)
@@ -1,6 +1,7 @@
 """Tests for `preprocessprocessor` module"""
 
 import unittest
+from os.path import join
 from nafigator.preprocessprocessor import convert_pdf, convert_docx
 
 unittest.TestLoader.sortTestMethodsUsing = None
@@ -26,6 +27,118 @@ def test_convert_pdf():
     pass
 
 
+def test_convert_pdf_multiple_formats():
+    """
+    This function converts a pdf file into xml and text in a single pass.
+    Level: 0
+    Scenarios:
+        output equals the output of separate conversions
+    """
+    path = join("tests", "tests", "example.pdf")
+    expected = {"fileDesc": {}}
+    convert_pdf(path, format="xml", params=expected)
+    convert_pdf(path, format="text", params=expected)
+    actual = {"fileDesc": {}}
+    convert_pdf(path, format=["xml", "text"], params=actual)
+    assert actual["pdftoxml"] == expected["pdftoxml"]
+    assert actual["pdftotext"] == expected["pdftotext"]
+    assert actual["fileDesc"]["pages"] == expected["fileDesc"]["pages"]
+
+
+def test_convert_pdf_page_handler():
+    """
+    This function passes the xml of each page of a pdf file to a page handler.
+    Level: 0
+    Scenarios:
+        pages passed to the handler equal the pages of the xml output
+    """
+    path = join("tests", "tests", "example.pdf")
+    expected = {"fileDesc": {}}
+    convert_pdf(path, format="xml", params=expected)
+    pages = []
+    actual = {"fileDesc": {}}
+    convert_pdf(path, format=["xml", "text"], params=actual, page_handler=pages.append)
+    assert "pdftoxml" not in actual.keys()
+    assert len(pages) == actual["fileDesc"]["pages"]
+    assert b"".join(pages).decode() in expected["pdftoxml"]
+
+
+def test_convert_pdf_workers():
+    """
+    This function converts a pdf file with a pool of processes.
+    Level: 0
+    Scenarios:
+        output equals the output of the conversion in a single process
+    """
+    path = join("tests", "tests", "example.pdf")
+    expected = {"fileDesc": {}}
+    convert_pdf(path, format=["xml", "text"], params=expected)
+    actual = {"fileDesc": {}, "pdf_workers": 2}
+    convert_pdf(path, format=["xml", "text"], params=actual)
+    assert actual["pdftoxml"] == expected["pdftoxml"]
+    assert actual["pdftotext"] == expected["pdftotext"]
+    assert actual["fileDesc"]["pages"] == expected["fileDesc"]["pages"]
+
+
+def test_convert_pdf_parallel(monkeypatch):
+    """
+    This function converts the pages of a pdf with a bounded number of ranges in progress.
+    Level: 0
+    Scenarios:
+        pages of a stream in page order
+        at most workers ranges submitted ahead of the pages that are returned
+        the ranges read the pages from a temporary file that is removed afterwards
+    """
+    import os
+    from io import BytesIO
+    from types import SimpleNamespace
+    from nafigator import preprocessprocessor
+
+    class SequentialExecutor:
+        """Executor that runs the tasks when they are submitted"""
+
+        def __init__(self, max_workers=None):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def submit(self, fn, path, pagenos, *args):
+            paths.append(path)
+            counts["submitted"] += 1
+            in_progress.append(counts["submitted"] - counts["returned"])
+
+            def result():
+                counts["returned"] += 1
+                return [{"page": pageno} for pageno in pagenos]
+
+            return SimpleNamespace(result=result)
+
+    paths, in_progress, counts = list(), list(), {"submitted": 0, "returned": 0}
+    monkeypatch.setattr(preprocessprocessor, "ProcessPoolExecutor", SequentialExecutor)
+    monkeypatch.setattr(
+        preprocessprocessor,
+        "PDFPage",
+        SimpleNamespace(get_pages=lambda fp, **kwargs: range(20)),
+    )
+    stream = BytesIO(b"%PDF-1.4")
+    pages = [
+        page["page"]
+        for page in preprocessprocessor.convert_pdf_parallel(
+            stream=stream, formats=["text"], workers=2
+        )
+    ]
+    assert pages == list(range(20))
+    assert counts["submitted"] == 7
+    # one range is handled while the next ones are converted
+    assert max(in_progress) <= 3
+    assert len(set(paths)) == 1
+    assert not os.path.exists(paths[0])
+
+
 # @TODO: write in later refactoring phase
 def test_convert_docx():
     """
@@ -39,3 +152,60 @@ def test_convert_docx():
     Level: Out of scope in refactoring phase 1
     """
     pass
+
+
+def test_preprocess_cache():
+    """
+    This function stores and loads the results of the preprocessing steps on disk.
+    Level: 0
+    Scenarios:
+        results are loaded for the same input and params
+        results are not loaded for other params
+        least recently used results are removed above the maximum size
+        tables and bytes are stored as JSON and loaded with the same values
+    """
+    import os
+    import tempfile
+    import pandas as pd
+    from types import SimpleNamespace
+    from nafigator.preprocessprocessor import PreprocessCache
+
+    path = join("tests", "tests", "example.pdf")
+    with tempfile.TemporaryDirectory() as directory:
+        cache = PreprocessCache(directory)
+        params = {"fileDesc": {"filename": path}, "pdftotext": "text", "derived_text": "text"}
+        key = cache.key(params)
+        assert cache.load(key, params) is False
+        cache.store(key, dict(params, fileDesc={"filename": path, "pages": 2}))
+
+        actual = {"fileDesc": {"filename": path}}
+        assert cache.load(key, actual) is True
+        assert actual["pdftotext"] == "text"
+        assert actual["derived_text"] == "text"
+        assert actual["fileDesc"]["pages"] == 2
+        assert cache.key({"fileDesc": {"filename": path}, "incl_bbox": True}) != key
+
+        size = os.path.getsize(cache.path(key))
+        cache.max_size = int(1.5 * size)
+        other = cache.key({"fileDesc": {"filename": path}, "incl_bbox": True})
+        os.utime(cache.path(key), (0, 0))
+        cache.store(other, dict(params, fileDesc={"filename": path, "pages": 2}))
+        assert not os.path.exists(cache.path(key))
+        assert os.path.exists(cache.path(other))
+        assert cache.size == os.path.getsize(cache.path(other))
+
+        # tables and bytes
+        table = SimpleNamespace(
+            page=1, order=1, shape=(1, 2), _bbox=(1.5, 2.0, 3.25, 4.0), cols=[(1.5, 2.0), (2.0, 3.25)],
+            df=pd.DataFrame([["a", "b"]]),
+        )
+        params = {"fileDesc": {"filename": path}, "pdftotables": [table], "docxtoxml": b"<w:document/>"}
+        cache.max_size = 2**30
+        cache.store(key, params)
+        actual = {"fileDesc": {"filename": path}}
+        assert cache.load(key, actual) is True
+        assert actual["docxtoxml"] == b"<w:document/>"
+        loaded = actual["pdftotables"][0]
+        for name in ["page", "order", "shape", "_bbox", "cols"]:
+            assert str(loaded.__dict__[name]) == str(table.__dict__[name])
+        assert loaded.df.values.tolist() == [["a", "b"]]
@@ -1506,6 +1506,61 @@ class TestUtils(unittest.TestCase):
         """
         pass
 
+    def test_dataframe2naf_workers(self):
+        """
+        This function evaluates that failing documents in a process pool do not stop the batch.
+        Level: 1
+        Scenarios:
+            non-existing dc:source with workers=2
+        """
+        df_meta = pd.DataFrame(
+            {
+                "dc:source": ["non_existing_1.pdf", "non_existing_2.txt"],
+                "dc:language": ["en", "EN"],
+            }
+        )
+        actual = dataframe2naf(
+            df_meta, engine="stanza", naf_version="v3.1", workers=2
+        )
+        self.assertEqual(list(actual["naf:status"]), ["ERROR, generate_naf"] * 2)
+
+    def test_dataframe2naf_workers_unpicklable_nlp(self):
+        """
+        This function evaluates that documents are processed sequentially if the worker processes cannot be started.
+        Level: 1
+        Scenarios:
+            nlp that cannot be pickled for spawned worker processes with workers=2
+        """
+        from unittest import mock
+        import nafigator.utils
+
+        class SpawningExecutor:
+            def __init__(self, max_workers=None, initializer=None, initargs=()):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def submit(self, function, *args):
+                raise TypeError("cannot pickle '_thread.lock' object")
+
+        df_meta = pd.DataFrame(
+            {
+                "dc:source": ["non_existing_1.pdf", "non_existing_2.txt"],
+                "dc:language": ["en", "en"],
+            }
+        )
+        nlp = object()
+        with mock.patch("nafigator.utils.ProcessPoolExecutor", SpawningExecutor), mock.patch(
+            "nafigator.utils._dataframe2naf_task", wraps=nafigator.utils._dataframe2naf_task
+        ) as task:
+            actual = dataframe2naf(df_meta, engine="spacy", naf_version="v3.1", nlp=nlp, workers=2)
+        self.assertEqual([call.kwargs["nlp"] for call in task.call_args_list], [nlp, nlp])
+        self.assertEqual(list(actual["naf:status"]), ["ERROR, generate_naf"] * 2)
+
     def test_load_dtd(self):
         """
         This function loads dtd